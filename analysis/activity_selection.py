@@ -4,20 +4,25 @@
 
 """activity_selection.py
 
-A recursive implementation of the activity-selection problem, as per CLRS
-(Introduction to Algorithms, Section 16.1), in its greedy polynomial version,
-giving the optimal scheduling.
+Recursive and iterative implementations of the activity-selection problem, as
+per CLRS (Introduction to Algorithms, Section 16.1), in its greedy polynomial
+version, giving the optimal scheduling. Weighted intervals are scheduled by
+dynamic programming, and intervals are also split among the fewest resources
+that can hold them all. Streams of intervals can be scheduled as they arrive,
+sorted either by end or, with a bounded buffer, by start.
 """
 
 from __future__ import absolute_import
 
+from bisect import bisect_left
 from collections import namedtuple
+from heapq import heappop, heappush, heapreplace, merge
 from operator import itemgetter
 from pprint import pprint
 from random import randint
-from typing import Set
+from typing import Iterable, Iterator, List, Set
 
-Interval = namedtuple("Interval", ["start", "end"])
+Interval = namedtuple("Interval", ["start", "end", "weight"], defaults=[1])
 
 
 def gen_rand_intervals(
@@ -32,15 +37,146 @@ def gen_rand_intervals(
     return intervals
 
 
-def schedule(intervals: Set[Interval]) -> Set[Interval]:
+def schedule_rec(intervals: Set[Interval], stats=None) -> Set[Interval]:
     ans = set()
     if intervals:
         _min = min(intervals, key=itemgetter(1))
         ans.add(_min)
         removed = set(filter(lambda intv: intv.start > _min.end, intervals))
-        ans.update(schedule(removed))
+        ans.update(schedule_rec(removed))
+    if stats is not None:
+        # one level per interval taken, plus the one that finds none left
+        stats.count("depth", len(ans) + 1)
+        stats.export("schedule_rec")
     return ans
 
 
+def schedule(
+    intervals: Iterable[Interval], presorted: bool = False, stats=None
+) -> Set[Interval]:
+    # a single sweep in order of end, skipping the sort if the intervals
+    # already come that way; among intervals with the same end, the first
+    # one met is taken, so the ends always match those of `schedule_rec`;
+    # `stats` is anything with the `count` and `export` methods of
+    # `instrumentation.Stats`, which lives with the optimization solvers
+    if not presorted:
+        intervals = sorted(intervals, key=itemgetter(1))
+    ans = set()
+    last_end = None
+    swept = 0
+    for swept, intv in enumerate(intervals, 1):
+        if last_end is None or intv.start > last_end:
+            ans.add(intv)
+            last_end = intv.end
+    if stats is not None:
+        stats.count("iterations", swept)
+        stats.count("selected", len(ans))
+        stats.export("schedule")
+    return ans
+
+
+def weighted_schedule(intervals: Iterable[Interval]) -> Set[Interval]:
+    # best[j] is the largest weight using the first j intervals by end, and
+    # each interval is compatible with those before the one found by bisect
+    intervals = sorted(intervals, key=itemgetter(1))
+    ends = [intv.end for intv in intervals]
+    previous = [bisect_left(ends, intv.start) for intv in intervals]
+    best = [0]
+    for intv, prev in zip(intervals, previous):
+        best.append(max(best[-1], best[prev] + intv.weight))
+
+    ans = set()
+    j = len(intervals)
+    while j:
+        if best[j] == best[j - 1]:
+            j -= 1
+        else:
+            ans.add(intervals[j - 1])
+            j = previous[j - 1]
+    return ans
+
+
+def partition(intervals: Iterable[Interval]) -> List[Set[Interval]]:
+    # in order of start, each interval goes to the resource freed earliest,
+    # or to a new one if even that is still busy
+    resources = []
+    busy = []
+    for intv in sorted(intervals, key=itemgetter(0)):
+        if busy and busy[0][0] < intv.start:
+            _, index = heapreplace(busy, (intv.end, busy[0][1]))
+        else:
+            index = len(resources)
+            resources.append(set())
+            heappush(busy, (intv.end, index))
+        resources[index].add(intv)
+    return resources
+
+
+def stream_schedule(*shards: Iterable[Interval]) -> Iterator[Interval]:
+    # the same sweep as `schedule`, over one or more streams sorted by end
+    # that are merged lazily, yielding each interval as soon as it is taken
+    last_end = None
+    prev_end = None
+    for intv in merge(*shards, key=itemgetter(1)):
+        if prev_end is not None and intv.end < prev_end:
+            raise ValueError("{} arrived out of order of end".format(intv))
+        prev_end = intv.end
+        if last_end is None or intv.start > last_end:
+            last_end = intv.end
+            yield intv
+
+
+def online_schedule(
+    intervals: Iterable[Interval], lookahead: int = 0
+) -> Iterator[Interval]:
+    # for arrivals in order of start, the compatible interval ending first
+    # is kept as a candidate, and it is taken once an arrival starts after
+    # its end, as none of the later ones can end before it; up to
+    # `lookahead` arrivals are buffered to restore the order of start
+    last_end = None
+    candidate = None
+    for intv in _reorder(intervals, lookahead):
+        if last_end is not None and intv.start <= last_end:
+            continue
+        if candidate is not None and intv.start > candidate.end:
+            yield candidate
+            last_end, candidate = candidate.end, None
+        if candidate is None or intv.end < candidate.end:
+            candidate = intv
+    if candidate is not None:
+        yield candidate
+
+
+def _reorder(intervals: Iterable[Interval], window: int) -> Iterator[Interval]:
+    buffer = []
+    last_start = None
+    for intv in intervals:
+        if last_start is not None and intv.start < last_start:
+            raise ValueError("{} arrived too late".format(intv))
+        if len(buffer) < window:
+            heappush(buffer, intv)
+            continue
+        if buffer and buffer[0] < intv:
+            intv = heapreplace(buffer, intv)
+        last_start = intv.start
+        yield intv
+    while buffer:
+        yield heappop(buffer)
+
+
 if __name__ == "__main__":
-    pprint(sorted(schedule(gen_rand_intervals())))
+    INTERVALS = gen_rand_intervals()
+    assert sorted(intv.end for intv in schedule(INTERVALS)) == sorted(
+        intv.end for intv in schedule_rec(INTERVALS)
+    )
+    assert len(weighted_schedule(INTERVALS)) == len(schedule(INTERVALS))
+    for resource in partition(INTERVALS):
+        assert len(schedule(resource)) == len(resource)
+    BY_END = sorted(INTERVALS, key=itemgetter(1))
+    assert sorted(
+        intv.end for intv in stream_schedule(BY_END[::2], BY_END[1::2])
+    ) == sorted(intv.end for intv in schedule(BY_END, presorted=True))
+    assert sorted(intv.end for intv in online_schedule(sorted(INTERVALS))) == (
+        sorted(intv.end for intv in schedule(INTERVALS))
+    )
+    pprint(sorted(schedule(INTERVALS)))
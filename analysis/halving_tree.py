@@ -4,7 +4,7 @@
 
 """halving_tree.py
 
-Three separate implementations that print the number of nodes below the root
+Separate implementations that print the number of nodes below the root
 for a tree that, starts with `n` children and halves this number at each level.
 For instance, if `n` is 3, one has twelve nodes, numbered below as if covered
 by a breadth-first search.
@@ -13,11 +13,14 @@ by a breadth-first search.
                     01         02           03         04
                 ┌───┴───┐   ┌───┴───┐   ┌───┴───┐   ┌───┴───┐
                 05     06   07     08   09     10   11     12
+
+The exact implementations use only integer arithmetic, in O(log n) operations.
 """
 
 from __future__ import absolute_import, division
 
 from math import log2
+from typing import Iterable, List
 
 
 def orig_rec(num: int) -> int:
@@ -44,7 +47,60 @@ def iter_form(num: int) -> int:
     )
 
 
+def exact_form(num: int) -> int:
+    # Horner's rule on the recurrence of `simpl_rec`, from the bottom of the
+    # halving chain up, with no node below a level with at most one child
+    chain = []
+    while num > 1:
+        chain.append(num)
+        num //= 2
+    count = 0
+    for num in reversed(chain):
+        count = num * (count + 1)
+    return count
+
+
+def exact_pow2_form(k: int) -> int:
+    # the terms of `iter_form` for `num = 2 ** k`, as integer powers of two
+    return sum(1 << (i * k - i * (i - 1) // 2) for i in range(1, k + 1))
+
+
+def batch_form(nums: Iterable[int]) -> List[int]:
+    # `exact_form` for many values at once, where each level of the halving
+    # chains is computed only once across all of them
+    memo = {0: 0, 1: 0}
+    counts = []
+    for num in nums:
+        chain = []
+        while num not in memo:
+            chain.append(num)
+            num //= 2
+        for num in reversed(chain):
+            memo[num] = num * (memo[num // 2] + 1)
+        counts.append(memo[num])
+    return counts
+
+
+def check(limit: int = 1 << 7, small: int = 1 << 5):
+    # every implementation against the exact one, `orig_rec` only on the
+    # smallest values as it takes exponential time, and `iter_form` only on
+    # powers of two, where its formula holds and its floats are exact
+    global COUNTER
+    nums = range(1, limit)
+    assert batch_form(nums) == [exact_form(num) for num in nums]
+    for num in nums:
+        assert exact_form(num) == simpl_rec(num)
+        if num < small:
+            COUNTER = 0
+            assert exact_form(num) == orig_rec(num)
+    for k in range(limit.bit_length()):
+        assert exact_form(1 << k) == exact_pow2_form(k) == iter_form(1 << k)
+
+
 if __name__ == "__main__":
-    for k in range(3):
-        COUNTER = 0
-        assert orig_rec(1 << k) == simpl_rec(1 << k) == iter_form(1 << k)
+    check()
+    assert exact_form(1 << 64) == exact_pow2_form(64)
+    assert batch_form([1 << 64, 3 << 70]) == [
+        exact_form(1 << 64),
+        exact_form(3 << 70),
+    ]
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""benchmark
+
+Scaling runs of the solvers found in `analysis` and `optimization`, over
+instances of growing size drawn from fixed seeds. Each run records its wall
+time, its peak memory and the objective value of its solution, and a set of
+runs can be checked against a previous one to flag regressions.
+"""
+
+from __future__ import absolute_import
+
+import os
+import sys
+import tracemalloc
+from gc import collect
+from time import perf_counter
+from typing import Callable, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ("analysis", "optimization"):
+    if os.path.join(ROOT, folder) not in sys.path:
+        sys.path.insert(0, os.path.join(ROOT, folder))
+
+# seconds below which differences in wall time are deemed noise
+TIME_SLACK = 0.005
+
+# bytes below which differences in peak memory are deemed noise
+MEMORY_SLACK = 1 << 16
+
+# relative difference below which objective values are deemed equal, as the
+# sums of floating-point costs may be rounded differently
+OBJECTIVE_SLACK = 1e-9
+
+
+def measure(
+    solve: Callable, instance: tuple, repeat: int = 3
+) -> Tuple[float, float, int]:
+    """
+    Run a solver on an instance, timing it with tracing off and then tracing
+    its allocations in one more run.
+
+    :param solve:       Function that takes the instance and returns the
+                        objective value of its solution.
+    :param instance:    Arguments given to `solve`.
+    :param repeat:      Number of timed runs, of which the fastest counts.
+    :return:            The objective value, the wall time in seconds and the
+                        peak of memory allocated in bytes.
+    """
+    seconds = float("inf")
+    for _ in range(repeat):
+        collect()
+        start = perf_counter()
+        objective = solve(*instance)
+        seconds = min(seconds, perf_counter() - start)
+
+    collect()
+    tracemalloc.start()
+    try:
+        solve(*instance)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return objective, seconds, peak
+
+
+def compare(
+    results: List[Dict], baseline: List[Dict], tolerance: float = 0.25
+) -> List[str]:
+    """
+    Regressions of a set of runs against a previous one: runs that became
+    slower or hungrier by more than `tolerance`, beyond the noise slacks, and
+    runs whose solutions changed, for exact solvers, or got worse, for those
+    that maximize or minimize. Runs missing from either side are skipped.
+
+    :param results:     Records written by `run`.
+    :param baseline:    Records of the same shape from a previous run.
+    :param tolerance:   Relative growth allowed in time and memory.
+    :return:            A description of each regression.
+    """
+    before = {(item["suite"], item["size"]): item for item in baseline}
+    regressions = []
+
+    for item in results:
+        old = before.get((item["suite"], item["size"]))
+        if old is None:
+            continue
+        name = "{}[{}]".format(item["suite"], item["size"])
+
+        if item["seconds"] > old["seconds"] * (1 + tolerance) + TIME_SLACK:
+            regressions.append(
+                "{}: {:.4f}s, was {:.4f}s".format(
+                    name, item["seconds"], old["seconds"]
+                )
+            )
+        if item["peak"] > old["peak"] * (1 + tolerance) + MEMORY_SLACK:
+            regressions.append(
+                "{}: {} bytes at peak, was {}".format(
+                    name, item["peak"], old["peak"]
+                )
+            )
+
+        change = item["objective"] - old["objective"]
+        if abs(change) <= OBJECTIVE_SLACK * max(1.0, abs(old["objective"])):
+            continue
+        if item["sense"] == "exact" or (item["sense"] == "max") != (
+            change > 0
+        ):
+            regressions.append(
+                "{}: objective {}, was {}".format(
+                    name, item["objective"], old["objective"]
+                )
+            )
+
+    return regressions
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""__main__.py
+
+Command line of the benchmark, run from the root of the repository as
+`python -m benchmark`. It writes the records of every run to a JSON file and,
+given a baseline written the same way, exits with a non-zero status if any
+run regressed.
+"""
+
+from __future__ import absolute_import
+
+import json
+import sys
+from argparse import ArgumentParser
+
+from benchmark import compare
+from benchmark.suites import SUITES, run
+
+
+def main() -> int:
+    parser = ArgumentParser(prog="python -m benchmark")
+    parser.add_argument("suites", nargs="*", metavar="suite")
+    parser.add_argument("-o", "--output", default="benchmark.json")
+    parser.add_argument("-b", "--baseline")
+    parser.add_argument("-t", "--tolerance", type=float, default=0.25)
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    parser.add_argument(
+        "-q", "--quick", action="store_true", help="skip the largest sizes"
+    )
+    args = parser.parse_args()
+    for name in args.suites:
+        if name not in SUITES:
+            parser.error("unknown suite {}".format(name))
+
+    results = []
+    for item in run(args.suites, int(args.quick), args.repeat):
+        print(
+            "{suite:>16} {size:>8} {seconds:>10.4f}s {peak:>12}B "
+            "{objective:>16.6g}".format(**item)
+        )
+        results.append(item)
+
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent=2)
+
+    if args.baseline is None:
+        return 0
+    with open(args.baseline) as baseline:
+        regressions = compare(results, json.load(baseline), args.tolerance)
+    for regression in regressions:
+        print(regression, file=sys.stderr)
+    return int(bool(regressions))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""suites.py
+
+Instances and solvers measured by the benchmark. Each suite builds one
+instance per size from a seed derived from `SEED`, so that every run measures
+the same instances, and solves it down to the objective value of the
+solution. For the exact solvers the objective must stay the same, while the
+heuristics are only required not to make it worse.
+"""
+
+from __future__ import absolute_import
+
+from collections import namedtuple
+from random import Random, seed
+from typing import Dict, Iterator, List
+
+from benchmark import measure
+
+from activity_selection import gen_rand_intervals, schedule
+from cheap_route import CSRGraph, cheapest_route, dijkstra
+from multiple_knapsack import Item, knapsack, mkp, total_value
+from spanning_tree import Graph
+
+SEED = 0x5EED
+
+Suite = namedtuple("Suite", ["sizes", "build", "solve", "sense"])
+
+
+def _items(rand: Random, size: int) -> List[Item]:
+    return [
+        Item(rand.randint(1, 1000), rand.randint(1, 1000)) for _ in range(size)
+    ]
+
+
+def build_knapsack(rand: Random, size: int) -> tuple:
+    items = _items(rand, size)
+    return items, sum(item.weight for item in items) // 4
+
+
+def solve_knapsack(items: List[Item], capacity: int) -> float:
+    return knapsack(items, capacity)[0]
+
+
+def build_mkp(rand: Random, size: int) -> tuple:
+    items = _items(rand, size)
+    share = sum(item.weight for item in items) // 16
+    return items, [rand.randint(share // 2, share) for _ in range(4)]
+
+
+def solve_mkp(items: List[Item], trucks: List[int]) -> float:
+    return total_value(mkp(items, trucks))
+
+
+def build_dijkstra(rand: Random, size: int) -> tuple:
+    edges = [
+        (rand.randrange(size), rand.randrange(size), rand.uniform(1, 100))
+        for _ in range(4 * size)
+    ]
+    return (CSRGraph.from_edges(size, edges),)
+
+
+def solve_dijkstra(graph: CSRGraph) -> float:
+    dist, _ = dijkstra(graph, 0)
+    return sum(value for value in dist if value != float("inf"))
+
+
+def build_route(rand: Random, size: int) -> tuple:
+    graph = [
+        [rand.uniform(1, 100) if i != j else 0 for i in range(size)]
+        for j in range(size)
+    ]
+    tolls = [rand.uniform(0, 10) for _ in range(size)]
+    return graph, tolls, 0, size - 1, 5.0, 12.0
+
+
+def solve_route(graph, tolls, source, dest, gas_price, autonomy) -> float:
+    return cheapest_route(graph, tolls, source, dest, gas_price, autonomy)[1]
+
+
+def build_kruskal(rand: Random, size: int) -> tuple:
+    edges = {
+        (rand.randrange(size), rand.randrange(size), rand.randint(0, 1000))
+        for _ in range(4 * size)
+    }
+    return (Graph(set(range(size)), edges),)
+
+
+def solve_kruskal(graph: Graph) -> float:
+    return sum(edge[2] for edge in graph.kruskal())
+
+
+def build_schedule(rand: Random, size: int) -> tuple:
+    # `gen_rand_intervals` draws from the module-level generator
+    seed(rand.random())
+    return (gen_rand_intervals(1, 100 * size, size),)
+
+
+def solve_schedule(intervals) -> float:
+    return len(schedule(intervals))
+
+
+SUITES = {
+    "knapsack": Suite(
+        [100, 200, 400, 800], build_knapsack, solve_knapsack, "exact"
+    ),
+    "mkp": Suite([50, 100, 200, 400], build_mkp, solve_mkp, "max"),
+    "dijkstra": Suite(
+        [1000, 10000, 100000], build_dijkstra, solve_dijkstra, "exact"
+    ),
+    "cheapest_route": Suite(
+        [50, 100, 200, 400], build_route, solve_route, "exact"
+    ),
+    "kruskal": Suite(
+        [1000, 10000, 100000], build_kruskal, solve_kruskal, "exact"
+    ),
+    "schedule": Suite(
+        [1000, 10000, 100000], build_schedule, solve_schedule, "exact"
+    ),
+}
+
+
+def run(
+    names: List[str] = None, largest: int = 0, repeat: int = 3
+) -> Iterator[Dict]:
+    """
+    Measure the suites on each of their sizes.
+
+    :param names:   Suites to run, or None for all of them.
+    :param largest: Number of sizes to skip at the top of each suite.
+    :param repeat:  Number of timed runs of each instance.
+    :return:        Generator of one record per suite and size.
+    """
+    for name in names or SUITES:
+        suite = SUITES[name]
+        sizes = suite.sizes[: len(suite.sizes) - largest] or suite.sizes[:1]
+        for size in sizes:
+            rand = Random("{}:{}:{}".format(SEED, name, size))
+            instance = suite.build(rand, size)
+            objective, seconds, peak = measure(suite.solve, instance, repeat)
+            yield {
+                "suite": name,
+                "size": size,
+                "seconds": seconds,
+                "peak": peak,
+                "objective": objective,
+                "sense": suite.sense,
+            }
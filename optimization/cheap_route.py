@@ -11,94 +11,977 @@ toll roads and a static vehicle autonomy.
 
 from __future__ import absolute_import, division
 
-from heapq import heappop, heappush
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from heapq import heapify, heappop, heappush
+from itertools import accumulate, chain
+from math import ceil, isclose, log2
+from operator import itemgetter
+from pickle import dump, load
 from random import random, randrange
-from typing import List, Tuple
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+from instrumentation import Stats
+
+INF = float("inf")
+
+# number of vertices up to which all pairs may be found by Floyd-Warshall,
+# whose matrices take quadratic memory
+FLOYD_LIMIT = 256
+
+# ratio between the cost of a step of Dijkstra's algorithm, run in Python,
+# and of a step of Floyd-Warshall, run by NumPy, as measured on random graphs
+FLOYD_SPEEDUP = 8
+
+
+class CSRGraph:
+    """
+    Directed and weighted graph in compressed sparse row form: the edges
+    leaving vertex `v` are stored at positions `indptr[v]` up to, but not
+    including, `indptr[v + 1]` of the parallel arrays `indices`, holding the
+    heads, and `weights`.
+
+    :param indptr:  Offsets of the first edge of each vertex, plus the total.
+    :param indices: Head of each edge.
+    :param weights: Weight of each edge.
+    """
+
+    def __init__(
+        self,
+        indptr: Iterable[int],
+        indices: Iterable[int],
+        weights: Iterable[float],
+    ):
+        self.indptr = array("q", indptr)
+        self.indices = array("q", indices)
+        self.weights = array("d", weights)
+        self._reverse = None
+
+    @classmethod
+    def from_edges(
+        cls, order: int, edges: Iterable[Tuple[int, int, float]]
+    ) -> "CSRGraph":
+        """
+        Build the graph from `(tail, head, weight)` triples over the vertices
+        `0` to `order - 1`.
+        """
+        edges = sorted(edges, key=itemgetter(0))
+        counts = [0] * (order + 1)
+        for tail, _, _ in edges:
+            counts[tail + 1] += 1
+        return cls(
+            accumulate(counts),
+            (head for _, head, _ in edges),
+            (weight for _, _, weight in edges),
+        )
+
+    @classmethod
+    def from_matrix(cls, graph: List[List[float]]) -> "CSRGraph":
+        """
+        Build the graph from an adjacency matrix, where zeros mean that there
+        is no edge.
+        """
+        indptr, indices, weights = [0], [], []
+        for row in graph:
+            heads = [index for index, edge in enumerate(row) if edge]
+            indices += heads
+            weights += [row[index] for index in heads]
+            indptr.append(len(indices))
+        return cls(indptr, indices, weights)
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    def neighbors(self, vertex: int) -> Iterator[Tuple[int, float]]:
+        """
+        Heads and weights of the edges leaving `vertex`.
+        """
+        start, stop = self.indptr[vertex], self.indptr[vertex + 1]
+        return zip(self.indices[start:stop], self.weights[start:stop])
+
+    def reverse(self) -> "CSRGraph":
+        """
+        The same graph with every edge pointing the other way, built with a
+        counting pass over the heads on the first call and kept afterwards.
+        """
+        if self._reverse is not None:
+            return self._reverse
+
+        counts = [0] * (len(self) + 1)
+        for head in self.indices:
+            counts[head + 1] += 1
+        indptr = array("q", accumulate(counts))
+        slots = indptr[:-1]
+        indices = array("q", bytes(8 * len(self.indices)))
+        weights = array("d", bytes(8 * len(self.weights)))
+
+        for tail in range(len(self)):
+            for edge in range(self.indptr[tail], self.indptr[tail + 1]):
+                head = self.indices[edge]
+                indices[slots[head]] = tail
+                weights[slots[head]] = self.weights[edge]
+                slots[head] += 1
+
+        self._reverse = CSRGraph(indptr, indices, weights)
+        self._reverse._reverse = self
+        return self._reverse
 
 
 def dijkstra(
-    graph: List[List[float]], source: int
+    graph: Union[List[List[float]], CSRGraph],
+    source: int,
+    target: int = -1,
+    stats: Optional[Stats] = None,
 ) -> Tuple[List[float], List[int]]:
     """
     Dijkstra's algorithm from CLRS (Introduction to Algorithms, Section 24.3),
     slightly modified to start with a different min-priority queue and
-    actually return data.
+    actually return data. Runs in O(E log V) over the sparse representation,
+    into which an adjacency matrix is converted first.
 
-    :param graph:   Adjacency matrix with values in the currency unit.
+    :param graph:   Adjacency matrix or `CSRGraph` with values in the
+                    currency unit.
     :param source:  Integer representing the source vertex.
+    :param target:  Integer representing a vertex after whose settling the
+                    search stops, or -1 to settle the whole graph.
+    :param stats:   `Stats` that receives the heap pushes and pops, the stale
+                    entries popped, the edges scanned and the relaxations.
     :return:        Distances between the source and all vertices in the
                     graph, and a list of hops that represent the shortest path.
+                    With a target, only the settled vertices are final.
     """
+    if not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_matrix(graph)
+    indptr, indices, weights = graph.indptr, graph.indices, graph.weights
+
     dist = [float("inf")] * len(graph)  # initialize-single-source
     dist[source] = 0
     prev = [-1] * len(graph)
 
     vertices = []
     heappush(vertices, (dist[source], source))
-    neighbors = [
-        (index for index, edge in enumerate(row) if edge) for row in graph
-    ]
+    pops = stale = scanned = 0
 
     while vertices:
-        _, curr = heappop(vertices)
-        for vert in neighbors[curr]:
-            alt = dist[curr] + graph[curr][vert]
+        cost, curr = heappop(vertices)
+        pops += 1
+        if cost > dist[curr]:  # already settled through a cheaper entry
+            stale += 1
+            continue
+        if curr == target:
+            break
+        start, stop = indptr[curr], indptr[curr + 1]
+        scanned += stop - start
+        for vert, weight in zip(indices[start:stop], weights[start:stop]):
+            alt = cost + weight
             if dist[vert] > alt:  # relaxation
                 dist[vert] = alt
                 prev[vert] = curr
                 heappush(vertices, (alt, vert))
 
+    if stats is not None:
+        # every relaxation pushes once, and what was pushed is either popped
+        # or still in the heap
+        pushes = pops + len(vertices)
+        stats.count("pushes", pushes)
+        stats.count("pops", pops)
+        stats.count("stale", stale)
+        stats.count("scanned", scanned)
+        stats.count("relaxations", pushes - 1)
+        stats.export("dijkstra")
+
     return dist, prev
 
 
+def bidirectional_dijkstra(
+    graph: CSRGraph, reverse: CSRGraph, source: int, dest: int
+) -> Tuple[List[int], float]:
+    """
+    Single-pair Dijkstra's algorithm that grows one search from `source` over
+    `graph` and another from `dest` over `reverse`, always advancing the one
+    with the cheaper frontier. Every edge scanned by either side may close a
+    path through vertices labelled by the other, and the search stops as soon
+    as the two frontiers together cost no less than the best such path.
+    Labels are kept in dictionaries, so that only the explored area costs
+    memory.
+
+    :param graph:   Graph with values in the currency unit.
+    :param reverse: The same graph with its edges reversed.
+    :param source:  Integer representing the source vertex.
+    :param dest:    Integer representing the destination vertex.
+    :return:        The shortest path between `source` and `dest`, and its
+                    cost.
+    """
+    if source == dest:
+        return [source], 0
+
+    dist = ({source: 0}, {dest: 0})
+    hops = ({source: -1}, {dest: -1})
+    heaps = ([(0, source)], [(0, dest)])
+    best, meet = float("inf"), -1
+
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+        side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+        near, far = dist[side], dist[1 - side]
+        cost, curr = heappop(heaps[side])
+        if cost > near[curr]:  # already settled through a cheaper entry
+            continue
+        for vert, weight in (graph, reverse)[side].neighbors(curr):
+            alt = cost + weight
+            if alt < near.get(vert, best):  # relaxation
+                near[vert] = alt
+                hops[side][vert] = curr
+                heappush(heaps[side], (alt, vert))
+            if vert in far and alt + far[vert] < best:
+                best, meet = alt + far[vert], vert
+
+    if meet < 0:
+        return [dest], float("inf")
+
+    path = _walk(hops[0], meet)
+    curr = hops[1][meet]
+    while curr >= 0:
+        path.append(curr)
+        curr = hops[1][curr]
+
+    return path, best
+
+
+def _walk(prev, dest: int) -> List[int]:
+    """
+    Follow the hops in `prev` back from `dest`, returning them in order.
+    """
+    path, curr = [], dest
+
+    while prev[curr] >= 0:
+        path.append(curr)
+        curr = prev[curr]
+    path.append(curr)
+    path.reverse()
+
+    return path
+
+
+def _price(
+    graph: CSRGraph,
+    tolls: List[float],
+    gas_price: float,
+    autonomy: float,
+    reverse: bool = False,
+) -> CSRGraph:
+    """
+    Convert the weights of `graph` from kilometers to currency, adding the
+    toll of the tail of each edge, or of its head for a reversed graph, where
+    the head is the tail of the original edge.
+    """
+    weights = np.frombuffer(graph.weights, dtype=np.float64)
+    if reverse:
+        owners = np.frombuffer(graph.indices, dtype=np.int64)
+    else:
+        owners = np.repeat(
+            np.arange(len(graph)),
+            np.diff(np.frombuffer(graph.indptr, dtype=np.int64)),
+        )
+    costs = weights * (gas_price / autonomy)
+    costs += np.asarray(tolls, dtype=np.float64)[owners]
+    priced = array("d")
+    priced.frombytes(costs.tobytes())
+    return CSRGraph(graph.indptr, graph.indices, priced)
+
+
 def cheapest_route(
-    graph: List[List[int]],
+    graph: Union[List[List[int]], CSRGraph],
     tolls: List[float],
     source: int,
     dest: int,
     gas_price: float,
     autonomy: float,
+    bidirectional: bool = False,
+    stats: Optional[Stats] = None,
 ) -> Tuple[List[int], float]:
     """
     Wrapper function that takes into account the parameters and transforms
     the graph accordingly, converting from kilometers to currency and adding
     the toll prices to all successors of a vertex. Furthermore, it constructs
     the shortest path by reverse iteration of the hops given by Dijkstra's
-    algorithm.
+    algorithm, which stops as soon as `dest` is settled.
 
-    :param graph:       Adjacency matrix representing a directed and weighted
-                        graph, with units in kilometers. The set of vertices
-                        is simply the non-negative integer numbers.
+    :param graph:       Adjacency matrix or `CSRGraph` representing a directed
+                        and weighted graph, with units in kilometers. The set
+                        of vertices is simply the non-negative integer numbers.
     :param tolls:       Function between the set of vertices and the positive
                         real numbers, represented as the mapping itself.
     :param source:      Integer representing the source vertex.
     :param dest:        Integer representing the destination vertex.
     :param gas_price:   A real value representing the gas price.
     :param autonomy:    A real value representing the kilometer per liter ratio.
+    :param bidirectional:   Whether to search from both ends at once. The
+                            reversal of a `CSRGraph` is built on the first
+                            such query and kept for the next ones.
+    :param stats:       `Stats` handed to `dijkstra`, for the one-way search.
     :return:            The shortest path between `source` and `dest`,
                         and its cost.
     """
-    if not graph or not sum(len(row) for row in graph):
+    if not isinstance(graph, CSRGraph):
+        if not graph or not sum(len(row) for row in graph):
+            return [], 0.0
+        assert len(graph) == len(graph[0])
+        graph = CSRGraph.from_matrix(graph)
+
+    if not len(graph):
         return [], 0.0
 
-    assert len(graph) == len(graph[0]) == len(tolls)
+    assert len(graph) == len(tolls)
     assert source <= len(graph) and dest <= len(graph)
 
-    mod_graph = [
-        [(edge * gas_price / autonomy) + toll if edge else 0 for edge in row]
-        for row, toll in zip(graph, tolls)
-    ]
+    priced = _price(graph, tolls, gas_price, autonomy)
+    if bidirectional:
+        # the reversal of `graph` is kept by it, so only pricing is repeated
+        reverse = _price(graph.reverse(), tolls, gas_price, autonomy, True)
+        return bidirectional_dijkstra(priced, reverse, source, dest)
 
-    dist, prev = dijkstra(mod_graph, source)
-    path, curr = [], dest
+    dist, prev = dijkstra(priced, source, dest, stats)
+    return _walk(prev, dest), dist[dest]
 
-    while prev[curr] >= 0:
-        path.append(curr)
-        curr = prev[curr]
-    path.append(curr)
+
+def fuel_route(
+    graph: Union[List[List[int]], CSRGraph],
+    tolls: List[float],
+    source: int,
+    dest: int,
+    stations: Dict[int, float],
+    autonomy: float,
+    tank: float,
+    fuel: float = -1.0,
+    step: float = 1.0,
+) -> Tuple[List[int], float, List[Tuple[int, float]]]:
+    """
+    Cheapest route that never runs out of fuel, with a tank of limited size
+    that can only be filled at some vertices, each with its own gas price.
+    The search runs Dijkstra's algorithm over states made of a vertex and a
+    fuel level, counted in units of `step` liters, where driving an edge
+    burns the units it needs and pays the toll of its tail, and a station
+    sells one unit at a time. Each state keeps the cheapest cost found so far,
+    and entries of the heap that no longer match it are stale. States are
+    settled in order of cost, so a state is also dominated, and pruned, as
+    soon as its vertex was settled with at least as much fuel.
+
+    Buying only what the next edge needs, or a full tank, would not be exact:
+    the cheapest plan may carry fuel across several edges with no station,
+    or arrive at a cheaper station with just enough, so units are kept.
+
+    :param graph:       Adjacency matrix or `CSRGraph` representing a directed
+                        and weighted graph, with units in kilometers.
+    :param tolls:       Toll of each vertex.
+    :param source:      Integer representing the source vertex.
+    :param dest:        Integer representing the destination vertex.
+    :param stations:    Gas price at each vertex where one can refuel.
+    :param autonomy:    A real value representing the kilometer per liter ratio.
+    :param tank:        Capacity of the tank, in liters.
+    :param fuel:        Fuel in the tank at `source`, or -1 for a full tank.
+    :param step:        Liters in each unit of fuel.
+    :return:            The cheapest feasible path, its cost, and the liters
+                        bought at each stop on the way.
+    """
+    if not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_matrix(graph)
+    assert len(graph) == len(tolls)
+
+    capacity = int(tank / step + 1e-9)
+    level = capacity if fuel < 0 else min(capacity, int(fuel / step + 1e-9))
+    need = [ceil(edge / autonomy / step - 1e-9) for edge in graph.weights]
+    indptr, indices = graph.indptr, graph.indices
+
+    # most fuel with which each vertex was settled, and cheapest cost and
+    # parent of each state
+    fullest = [-1] * len(graph)
+    best = {(source, level): 0}
+    parent = {(source, level): None}
+    labels = [(0, source, level)]
+    final = None
+
+    while labels:
+        cost, curr, level = heappop(labels)
+        if cost > best[curr, level] or level <= fullest[curr]:
+            continue
+        fullest[curr] = level
+        if curr == dest:
+            final = (cost, curr, level)
+            break
+        moves = [
+            (cost + tolls[curr], indices[edge], level - need[edge])
+            for edge in range(indptr[curr], indptr[curr + 1])
+            if need[edge] <= level
+        ]
+        if curr in stations and level < capacity:
+            moves.append((cost + stations[curr] * step, curr, level + 1))
+        for move in moves:
+            state = move[1:]
+            if move[2] > fullest[move[1]] and move[0] < best.get(state, INF):
+                best[state] = move[0]
+                parent[state] = (curr, level)
+                heappush(labels, move)
+
+    if final is None:
+        return [dest], INF, []
+
+    path, refuels, state = [], [], final[1:]
+    while state is not None:
+        previous = parent[state]
+        if previous is not None and previous[0] == state[0]:
+            if refuels and refuels[-1][0] == state[0]:
+                refuels[-1][1] += step
+            else:
+                refuels.append([state[0], step])
+        else:
+            path.append(state[0])
+        state = previous
     path.reverse()
 
-    return path, dist[dest]
+    return (
+        path,
+        final[0],
+        [(vertex, liters) for vertex, liters in refuels[::-1]],
+    )
+
+
+def floyd_warshall(graph: CSRGraph) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Floyd-Warshall algorithm from CLRS (Introduction to Algorithms, Section
+    25.2), relaxing every pair through each intermediate vertex at once with
+    NumPy. Takes O(V^3) time and O(V^2) memory, which only pays off for small
+    and dense graphs.
+
+    :param graph:   Graph with values in the currency unit.
+    :return:        Matrix of distances between every pair of vertices, and
+                    matrix of the hop before the last one of each path, or -1.
+    """
+    order = len(graph)
+    tails = np.repeat(np.arange(order), np.diff(graph.indptr))
+    heads = np.frombuffer(graph.indices, dtype=np.int64)
+    weights = np.frombuffer(graph.weights, dtype=np.float64)
+
+    dist = np.full((order, order), np.inf)
+    np.minimum.at(dist, (tails, heads), weights)
+    np.fill_diagonal(dist, 0)
+    prev = np.where(np.isfinite(dist), np.arange(order)[:, None], -1)
+    np.fill_diagonal(prev, -1)
+
+    for middle in range(order):
+        alt = dist[:, middle, None] + dist[None, middle, :]
+        better = alt < dist
+        dist = np.where(better, alt, dist)
+        prev = np.where(better, prev[middle][None, :], prev)
+
+    return dist, prev
+
+
+_SHARED_TREE = None
+
+
+def _tree_row(
+    graph: CSRGraph, columns: np.ndarray, predecessors: bool, source: int
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Costs from `source` to the vertices in `columns`, and the hop before
+    every vertex if `predecessors` is set, so that only one full-width row
+    of costs exists at a time.
+    """
+    dist, prev = dijkstra(graph, source)
+    dist = np.array(dist)[columns]
+    return dist, np.array(prev) if predecessors else None
+
+
+def _share(graph: CSRGraph, columns: np.ndarray, predecessors: bool):
+    """
+    Keep the arguments of `_tree_row` in a pool of processes, so that they
+    are sent only once.
+    """
+    global _SHARED_TREE  # pylint: disable=W0603
+    _SHARED_TREE = graph, columns, predecessors
+
+
+def _shared_tree(source: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    `_tree_row` from `source` with the arguments kept by `_share`.
+    """
+    return _tree_row(*_SHARED_TREE, source)
+
+
+def _fill_rows(
+    trees: Iterator[Tuple[np.ndarray, Optional[np.ndarray]]],
+    height: int,
+    width: int,
+    order: int,
+    predecessors: bool,
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Stack the rows given by `_tree_row` as they arrive, with the hops in the
+    narrowest integers that hold every vertex.
+    """
+    dist = np.empty((height, width))
+    prev = None
+    if predecessors:
+        kind = np.int32 if order < 1 << 31 else np.int64
+        prev = np.empty((height, order), dtype=kind)
+    for row, (costs, hops) in enumerate(trees):
+        dist[row] = costs
+        if predecessors:
+            prev[row] = hops
+    return dist, prev
+
+
+def cost_matrix(
+    graph: Union[List[List[int]], CSRGraph],
+    tolls: List[float],
+    gas_price: float,
+    autonomy: float,
+    sources: List[int] = None,
+    targets: List[int] = None,
+    predecessors: bool = False,
+    workers: int = 1,
+    method: str = "auto",
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Costs of the cheapest routes from many sources to many targets, pricing
+    the graph only once. Each source runs its own Dijkstra's algorithm, and
+    the sources are spread over a pool of processes; alternatively, small
+    graphs can be solved by Floyd-Warshall for every pair at once.
+
+    :param graph:           Adjacency matrix or `CSRGraph` with units in
+                            kilometers.
+    :param tolls:           Toll of each vertex.
+    :param gas_price:       A real value representing the gas price.
+    :param autonomy:        A real value representing the kilometer per liter
+                            ratio.
+    :param sources:         Rows of the matrix, or None for every vertex.
+    :param targets:         Columns of the matrix, or None for every vertex.
+    :param predecessors:    Whether to also return the hops of the routes.
+    :param workers:         Number of processes, or None for one per core.
+    :param method:          One of "dijkstra", "floyd" or "auto". The latter
+                            picks Floyd-Warshall for graphs of up to
+                            `FLOYD_LIMIT` vertices whose V^3 steps are fewer
+                            than `FLOYD_SPEEDUP` times the S(E + V)log V steps
+                            of running Dijkstra's algorithm from S sources.
+    :return:                Matrix of costs, with infinity where there is no
+                            route, and, if asked, matrix of the hop before
+                            each vertex on the route from each source, or -1.
+    """
+    if not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_matrix(graph)
+    assert len(graph) == len(tolls)
+
+    order = len(graph)
+    rows = np.arange(order) if sources is None else np.asarray(sources, int)
+    columns = np.arange(order) if targets is None else np.asarray(targets, int)
+    priced = _price(graph, tolls, gas_price, autonomy)
+
+    if method == "auto":
+        steps = rows.size * (len(graph.indices) + order) * log2(order + 1)
+        method = (
+            "floyd"
+            if order <= FLOYD_LIMIT and order ** 3 <= FLOYD_SPEEDUP * steps
+            else "dijkstra"
+        )
+    if method == "floyd":
+        dist, prev = floyd_warshall(priced)
+        dist, prev = dist[rows], prev[rows]
+        dist = np.ascontiguousarray(dist[:, columns])
+    elif method == "dijkstra":
+        # each row is cut down to the targets as soon as it is computed
+        shared = priced, columns, predecessors
+        if workers == 1:
+            trees = map(partial(_tree_row, *shared), rows.tolist())
+            dist, prev = _fill_rows(
+                trees, rows.size, columns.size, order, predecessors
+            )
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_share, initargs=shared
+            ) as executor:
+                trees = executor.map(_shared_tree, rows.tolist())
+                dist, prev = _fill_rows(
+                    trees, rows.size, columns.size, order, predecessors
+                )
+    else:
+        raise ValueError("unknown method: {}".format(method))
+
+    if not predecessors:
+        return dist, None
+    kind = np.int32 if order < 1 << 31 else np.int64
+    return dist, prev.astype(kind, copy=False)
+
+
+class RoutingSession:
+    """
+    Repeated `cheapest_route` queries over the same road graph, with bounded
+    least-recently-used caches of priced graphs, keyed by the pricing
+    parameters, and of shortest-path trees, keyed by those and the source.
+    Every key also holds the version of the tolls, which is bumped by any
+    change to them, so that no stale entry is ever served.
+
+    :param graph:       Adjacency matrix or `CSRGraph` with units in
+                        kilometers.
+    :param tolls:       Toll of each vertex.
+    :param graphs:      Maximum number of priced graphs to keep.
+    :param trees:       Maximum number of shortest-path trees to keep.
+    """
+
+    def __init__(
+        self,
+        graph: Union[List[List[int]], CSRGraph],
+        tolls: List[float],
+        graphs: int = 4,
+        trees: int = 64,
+    ):
+        if not isinstance(graph, CSRGraph):
+            graph = CSRGraph.from_matrix(graph)
+        assert len(graph) == len(tolls)
+        self.graph = graph
+        self.tolls = list(tolls)
+        self.version = 0
+        self.graphs = _LRUCache(graphs)
+        self.trees = _LRUCache(trees)
+
+    def invalidate(self):
+        """
+        Drop every cached entry, to be called whenever the tolls change.
+        """
+        self.version += 1
+        self.graphs.clear()
+        self.trees.clear()
+
+    def set_toll(self, vertex: int, toll: float):
+        """
+        Change the toll of a single vertex.
+        """
+        self.tolls[vertex] = toll
+        self.invalidate()
+
+    def set_tolls(self, tolls: List[float]):
+        """
+        Replace the toll of every vertex.
+        """
+        assert len(tolls) == len(self.graph)
+        self.tolls = list(tolls)
+        self.invalidate()
+
+    def priced(self, gas_price: float, autonomy: float) -> CSRGraph:
+        """
+        The graph with weights in currency, as `cheapest_route` builds it.
+        """
+        key = (self.version, gas_price, autonomy)
+        return self.graphs.get(
+            key, lambda: _price(self.graph, self.tolls, gas_price, autonomy)
+        )
+
+    def tree(
+        self, source: int, gas_price: float, autonomy: float
+    ) -> Tuple[List[float], List[int]]:
+        """
+        Distances and hops of the shortest-path tree rooted at `source`.
+        """
+        key = (self.version, gas_price, autonomy, source)
+        return self.trees.get(
+            key, lambda: dijkstra(self.priced(gas_price, autonomy), source)
+        )
+
+    def route(
+        self, source: int, dest: int, gas_price: float, autonomy: float
+    ) -> Tuple[List[int], float]:
+        """
+        Same as `cheapest_route` over the graph and tolls of the session.
+        """
+        dist, prev = self.tree(source, gas_price, autonomy)
+        return _walk(prev, dest), dist[dest]
+
+
+class _LRUCache:
+    """
+    Mapping that keeps at most `capacity` entries, evicting the least
+    recently used one first.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key, factory: Callable):
+        """
+        Value stored under `key`, computed by `factory` and stored if absent.
+        """
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        value = factory()
+        self.entries[key] = value
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        """
+        Drop every entry.
+        """
+        self.entries.clear()
+
+
+class ContractionHierarchy:
+    """
+    Routing index over a priced graph, after Geisberger et al. (Contraction
+    Hierarchies: Faster and Simpler Hierarchical Routing in Road Networks,
+    2008). Vertices are contracted one by one in order of edge difference,
+    adding a shortcut between two neighbors whenever a bounded witness search
+    finds no path at least as cheap avoiding the contracted vertex. Queries
+    run a bidirectional search that only climbs to higher ranks, and the
+    shortcuts of the resulting path are then unpacked into original edges.
+
+    :param upward:      Edges from each vertex to higher ranked ones.
+    :param downward:    Reversed edges into each vertex from higher ranked
+                        ones.
+    :param middle:      Contracted vertex of each shortcut, by tail and head.
+    """
+
+    # vertices settled by a witness search before it gives up, which may
+    # only add superfluous shortcuts
+    witness_limit = 64
+
+    def __init__(
+        self,
+        upward: CSRGraph,
+        downward: CSRGraph,
+        middle: Dict[Tuple[int, int], int],
+    ):
+        self.upward = upward
+        self.downward = downward
+        self.middle = middle
+
+    @classmethod
+    def build(
+        cls,
+        graph: CSRGraph,
+        tolls: List[float],
+        gas_price: float,
+        autonomy: float,
+    ) -> "ContractionHierarchy":
+        """
+        Price `graph` as `cheapest_route` does and contract it.
+        """
+        order = len(graph)
+        priced = _price(graph, tolls, gas_price, autonomy)
+        succ = [{} for _ in range(order)]
+        pred = [{} for _ in range(order)]
+        for tail in range(order):
+            for head, weight in priced.neighbors(tail):
+                if head != tail and weight < succ[tail].get(head, INF):
+                    succ[tail][head] = pred[head][tail] = weight
+
+        rank, middle, contracted = [order] * order, {}, [0] * order
+
+        def shortcuts(vertex: int) -> List[Tuple[int, int, float]]:
+            """
+            Shortcuts needed to contract `vertex` from the remaining graph.
+            """
+            needed = []
+            for tail, inbound in pred[vertex].items():
+                if rank[tail] < order:
+                    continue
+                targets = {
+                    head: inbound + outbound
+                    for head, outbound in succ[vertex].items()
+                    if rank[head] == order and head != tail
+                }
+                if not targets:
+                    continue
+                reach = _witness(
+                    succ, rank, tail, vertex, max(targets.values())
+                )
+                needed += [
+                    (tail, head, cost)
+                    for head, cost in targets.items()
+                    if reach.get(head, INF) > cost
+                ]
+            return needed
+
+        def priority(vertex: int) -> int:
+            """
+            Edge difference of contracting `vertex`, plus the number of its
+            neighbors already contracted, to spread contractions evenly.
+            """
+            return (
+                len(shortcuts(vertex))
+                - len(succ[vertex])
+                - len(pred[vertex])
+                + contracted[vertex]
+            )
+
+        queue = [(priority(vertex), vertex) for vertex in range(order)]
+        heapify(queue)
+        level = 0
+        while queue:
+            _, vertex = heappop(queue)
+            # lazy update: contract only if still the least important
+            current = priority(vertex)
+            if queue and current > queue[0][0]:
+                heappush(queue, (current, vertex))
+                continue
+            for tail, head, cost in shortcuts(vertex):
+                if cost < succ[tail].get(head, INF):
+                    succ[tail][head] = pred[head][tail] = cost
+                    middle[(tail, head)] = vertex
+            rank[vertex] = level
+            level += 1
+            for neighbor in chain(succ[vertex], pred[vertex]):
+                contracted[neighbor] += 1
+
+        return cls(
+            CSRGraph.from_edges(
+                order,
+                (
+                    (tail, head, weight)
+                    for tail in range(order)
+                    for head, weight in succ[tail].items()
+                    if rank[tail] < rank[head]
+                ),
+            ),
+            CSRGraph.from_edges(
+                order,
+                (
+                    (head, tail, weight)
+                    for tail in range(order)
+                    for head, weight in succ[tail].items()
+                    if rank[tail] > rank[head]
+                ),
+            ),
+            middle,
+        )
+
+    def route(self, source: int, dest: int) -> Tuple[List[int], float]:
+        """
+        Cheapest route between two vertices, with the same results as
+        `cheapest_route` over the graph and prices used to build the index.
+
+        :param source:  Integer representing the source vertex.
+        :param dest:    Integer representing the destination vertex.
+        :return:        The shortest path between `source` and `dest`, and its
+                        cost.
+        """
+        if source == dest:
+            return [source], 0
+
+        dist = ({source: 0}, {dest: 0})
+        hops = ({source: -1}, {dest: -1})
+        heaps = ([(0, source)], [(0, dest)])
+        best, meet = INF, -1
+
+        # unlike plain bidirectional search, each side may only stop once its
+        # own frontier is no cheaper than the best path, as both climb ranks
+        while heaps[0] or heaps[1]:
+            for side in (0, 1):
+                if not heaps[side]:
+                    continue
+                cost, curr = heappop(heaps[side])
+                if cost >= best:
+                    heaps[side].clear()
+                    continue
+                near, far = dist[side], dist[1 - side]
+                if cost > near[curr]:
+                    continue
+                if curr in far and cost + far[curr] < best:
+                    best, meet = cost + far[curr], curr
+                graph = (self.upward, self.downward)[side]
+                for vert, weight in graph.neighbors(curr):
+                    alt = cost + weight
+                    if alt < near.get(vert, INF):
+                        near[vert] = alt
+                        hops[side][vert] = curr
+                        heappush(heaps[side], (alt, vert))
+
+        if meet < 0:
+            return [dest], INF
+
+        packed = _walk(hops[0], meet)
+        curr = hops[1][meet]
+        while curr >= 0:
+            packed.append(curr)
+            curr = hops[1][curr]
+
+        path, pending = [packed[0]], list(zip(packed[-1:0:-1], packed[-2::-1]))
+        while pending:
+            head, tail = pending.pop()
+            if (tail, head) in self.middle:
+                vertex = self.middle[(tail, head)]
+                pending += [(head, vertex), (vertex, tail)]
+            else:
+                path.append(head)
+
+        return path, best
+
+    def save(self, path: str):
+        """
+        Write the index to a file, to be read back with `load`.
+        """
+        with open(path, "wb") as handle:
+            dump((self.upward, self.downward, self.middle), handle)
+
+    @classmethod
+    def load(cls, path: str) -> "ContractionHierarchy":
+        """
+        Read an index written by `save`.
+        """
+        with open(path, "rb") as handle:
+            return cls(*load(handle))
+
+
+def _witness(
+    succ: List[Dict[int, float]],
+    rank: List[int],
+    source: int,
+    avoid: int,
+    limit: float,
+) -> Dict[int, float]:
+    """
+    Distances from `source` over the vertices not yet contracted, except
+    `avoid`, up to `limit` and `ContractionHierarchy.witness_limit` settled
+    vertices.
+    """
+    uncontracted = len(rank)
+    dist, vertices, settled = {source: 0}, [(0, source)], 0
+
+    while vertices and settled < ContractionHierarchy.witness_limit:
+        cost, curr = heappop(vertices)
+        if cost > dist[curr]:
+            continue
+        if cost > limit:
+            break
+        settled += 1
+        for vert, weight in succ[curr].items():
+            if vert == avoid or rank[vert] < uncontracted:
+                continue
+            alt = cost + weight
+            if alt < dist.get(vert, INF):
+                dist[vert] = alt
+                heappush(vertices, (alt, vert))
+
+    return dist
 
 
 def random_tests(order: int, limit: int = 128, tests: int = 1000):
@@ -121,7 +1004,66 @@ def random_tests(order: int, limit: int = 128, tests: int = 1000):
             dest = randrange(order)
         gas_price, autonomy = limit * random(), limit * random()
 
-        cheapest_route(graph, tolls, source, dest, gas_price, autonomy)
+        _, cost = cheapest_route(
+            graph, tolls, source, dest, gas_price, autonomy
+        )
+        _, other = cheapest_route(
+            graph, tolls, source, dest, gas_price, autonomy, True
+        )
+        assert isclose(cost, other)
+
+
+def random_fuel_tests(order: int, limit: int = 128, tests: int = 1000):
+    """
+    Creates random sparse graphs with a tank and a few stations, and checks
+    `fuel_route` against a plain relaxation of every (vertex, units of fuel)
+    state until none improves.
+
+    :param order:   Integer representing the side of the adjacency matrix.
+    :param limit:   Integer representing the maximum value for all edges and
+                    other parameters.
+    :param tests:   Integer representing the number of tests to run.
+    """
+    for _ in range(tests):
+        graph = [
+            [
+                limit * random() if i != j and random() < 0.5 else 0
+                for i in range(order)
+            ]
+            for j in range(order)
+        ]
+        tolls = [limit * random() for _ in range(order)]
+        source, dest = randrange(order), randrange(order)
+        autonomy = 1 + random()
+        stations = {randrange(order): limit * random() for _ in range(3)}
+        tank, step = limit * random() / autonomy * 4, limit / 8 / autonomy
+        _, cost, _ = fuel_route(
+            graph, tolls, source, dest, stations, autonomy, tank, -1, step
+        )
+        capacity = int(tank / step + 1e-9)
+        reach = {(source, capacity): 0}
+        changed = True
+        while changed:
+            changed = False
+            for (curr, level), spent in list(reach.items()):
+                moves = [
+                    (head, level - ceil(edge / autonomy / step - 1e-9))
+                    for head, edge in enumerate(graph[curr])
+                    if edge
+                ]
+                prices = [tolls[curr]] * len(moves)
+                if curr in stations and level < capacity:
+                    moves.append((curr, level + 1))
+                    prices.append(stations[curr] * step)
+                for move, price in zip(moves, prices):
+                    if move[1] >= 0 and spent + price < reach.get(move, INF):
+                        reach[move] = spent + price
+                        changed = True
+        optimum = min(
+            (spent for (curr, _), spent in reach.items() if curr == dest),
+            default=INF,
+        )
+        assert cost == optimum or isclose(cost, optimum)
 
 
 def known_tests():
@@ -143,6 +1085,40 @@ def known_tests():
     tolls = [0] * len(graph)
     assert cheapest_route(graph, tolls, 0, 4, 1, 1) == ([0, 7, 6, 5, 4], 21)
 
+    # same graph, counting the work of a search of every vertex
+    stats = Stats()
+    dijkstra(graph, 0, stats=stats)
+    assert stats["pops"] == stats["pushes"] == stats["relaxations"] + 1
+    assert stats["pops"] - stats["stale"] == len(graph)
+    assert stats["scanned"] == sum(map(bool, chain(*graph)))
+
+    # same graph in sparse form, built from the matrix and from its edges
+    sparse = CSRGraph.from_matrix(graph)
+    assert cheapest_route(sparse, tolls, 0, 4, 1, 1) == ([0, 7, 6, 5, 4], 21)
+    sparse = CSRGraph.from_edges(
+        len(graph),
+        [
+            (tail, head, edge)
+            for tail, row in enumerate(graph)
+            for head, edge in enumerate(row)
+            if edge
+        ],
+    )
+    assert cheapest_route(sparse, tolls, 0, 4, 1, 1) == ([0, 7, 6, 5, 4], 21)
+
+    # same graph through a precomputed index, for every pair of vertices
+    index = ContractionHierarchy.build(sparse, tolls, 1, 1)
+    for source in range(len(graph)):
+        for dest in range(len(graph)):
+            _, cost = cheapest_route(sparse, tolls, source, dest, 1, 1)
+            assert index.route(source, dest)[1] == cost
+
+    # every pair of the same graph, by each method
+    dist, prev = cost_matrix(sparse, tolls, 1, 1, predecessors=True)
+    assert dist[0, 4] == 21 and _walk(prev[0], 4) == [0, 7, 6, 5, 4]
+    other, _ = cost_matrix(sparse, tolls, 1, 1, method="dijkstra", workers=2)
+    assert (dist == other).all()
+
     # regular graph with known result and no tolls
     graph = [[0, 10, 5, 0], [10, 0, 0, 20], [5, 0, 0, 30], [0, 20, 30, 0]]
     tolls = [0] * len(graph)
@@ -151,6 +1127,30 @@ def known_tests():
     # regular graph with known result and tolls
     tolls = [10, 20, 5, 5]
     assert cheapest_route(graph, tolls, 0, 3, 5, 2) == ([0, 2, 3], 102.5)
+    assert cheapest_route(graph, tolls, 0, 3, 5, 2, True) == ([0, 2, 3], 102.5)
+
+    # same graph through a session, before and after changing a toll
+    session = RoutingSession(graph, tolls, graphs=1, trees=1)
+    assert session.route(0, 3, 5, 2) == ([0, 2, 3], 102.5)
+    assert session.route(0, 2, 5, 2) == cheapest_route(
+        graph, tolls, 0, 2, 5, 2
+    )
+    assert session.route(3, 0, 5, 2) == cheapest_route(
+        graph, tolls, 3, 0, 5, 2
+    )
+    session.set_toll(2, 30)
+    assert session.route(0, 3, 5, 2) == ([0, 1, 3], 105)
+    assert len(session.trees) == len(session.graphs) == 1
+
+    # same graph with a 15 liter tank that starts with 5 liters and can
+    # only be filled at the vertex with the cheapest gas
+    tolls = [0] * len(graph)
+    stations = {1: 2, 2: 1}
+    assert fuel_route(graph, tolls, 0, 3, stations, 2, 15, 5, 0.5) == (
+        [0, 2, 3],
+        12.5,
+        [(2, 12.5)],
+    )
 
     # graph with no edges
     cheapest_route([[], [], [], []], tolls, 0, 3, 5, 2)
@@ -162,3 +1162,4 @@ def known_tests():
 if __name__ == "__main__":
     known_tests()
     random_tests(128)
+    random_fuel_tests(8)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""instrumentation.py
+
+Opt-in counters for the hot paths of the solvers. A solver that takes a
+`stats` argument adds what it did to it, e.g. the heap operations of
+`cheap_route.dijkstra` or the table cells of `multiple_knapsack.knapsack`,
+and hands the counters to every exporter of the object when it returns. With
+the default of None, the solvers only keep a few local integers, so the cost
+of the instrumentation is negligible when it is off.
+
+Solvers outside this folder, such as `activity_selection.schedule`, only call
+`count` and `export`, so any object with those two methods will do.
+"""
+
+from __future__ import absolute_import
+
+import logging
+from collections import Counter
+from typing import Callable, Dict
+
+Exporter = Callable[[str, Dict[str, int]], None]
+
+
+class Stats:
+    """
+    Counters gathered over one or more solver calls.
+
+    :param exporters:   Callbacks that receive the name of each solver that
+                        returns and a copy of the counters at that point.
+    """
+
+    def __init__(self, *exporters: Exporter):
+        self.counters = Counter()
+        self.exporters = list(exporters)
+
+    def __getitem__(self, name: str) -> int:
+        return self.counters[name]
+
+    def __repr__(self) -> str:
+        return "Stats({})".format(dict(self.counters))
+
+    def count(self, name: str, amount: int = 1):
+        """
+        Add `amount` to the counter `name`.
+        """
+        self.counters[name] += amount
+
+    def export(self, solver: str):
+        """
+        Hand the counters to every exporter, on behalf of `solver`.
+        """
+        for exporter in self.exporters:
+            exporter(solver, dict(self.counters))
+
+    def reset(self):
+        """
+        Zero every counter, keeping the exporters.
+        """
+        self.counters.clear()
+
+
+def log_exporter(
+    logger: logging.Logger = None, level: int = logging.DEBUG
+) -> Exporter:
+    """
+    Exporter that writes the counters to a logger, by default the one of this
+    module.
+    """
+    logger = logger or logging.getLogger(__name__)
+
+    def export(solver: str, counters: Dict[str, int]):
+        logger.log(level, "%s: %s", solver, counters)
+
+    return export
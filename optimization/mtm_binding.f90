@@ -0,0 +1,11 @@
+subroutine mtm_c(n, m, p, w, c, z, x, back, jck, jub) bind(c, name="mtm_c")
+    use iso_c_binding, only: c_int
+    implicit none
+    external MTM
+
+    integer(c_int), value :: n, m, back, jck
+    integer(c_int), dimension(*) :: p, w, c, x
+    integer(c_int) :: z, jub
+
+    call MTM(n, m, p, w, c, z, x, back, jck, jub)
+end subroutine mtm_c
@@ -11,25 +11,318 @@ with one and multiple knapsacks.
 
 from __future__ import absolute_import, division
 
+import ctypes
+from bisect import bisect_right
 from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from functools import lru_cache
-from typing import Dict, List, Set, Tuple
-from sys import maxsize
+from itertools import accumulate, repeat
+from os import path
+from random import Random
+from time import perf_counter
+from typing import (
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+from instrumentation import Stats
 
 Item = namedtuple("Item", ["value", "weight"])
+Approximation = namedtuple("Approximation", ["value", "items", "gap"])
+
+MTM_LIBRARY = path.join(path.dirname(path.abspath(__file__)), "libmtm.so")
+
+# capacity per item above which a table over every weight is considered a
+# waste, and the sparse frontier is used instead
+SPARSE_CAPACITY_RATIO = 1 << 12
+
+# rows kept by the table of `mkp`, to refill it after each truck is loaded
+MKP_CHECKPOINTS = 8
+
+
+class ItemArray:
+    """
+    Struct-of-arrays container for items, with their values and weights in
+    contiguous int64 arrays and an integer identifier for each one. Solvers
+    that receive it answer with identifiers instead of copies of the items.
+
+    :param values:  Non-negative integer value of each item.
+    :param weights: Non-negative integer weight of each item.
+    :param ids:     Identifier of each item, or None for their positions.
+    """
+
+    def __init__(self, values, weights, ids=None):
+        self.values = np.ascontiguousarray(values, dtype=np.int64)
+        self.weights = np.ascontiguousarray(weights, dtype=np.int64)
+        if ids is None:
+            ids = np.arange(self.values.size)
+        self.ids = np.ascontiguousarray(ids, dtype=np.int64)
+        assert self.values.shape == self.weights.shape == self.ids.shape
+
+    @classmethod
+    def from_items(cls, items: List[Item]) -> "ItemArray":
+        """
+        Pack a list of items, identified by their positions in it.
+        """
+        pairs = np.array(items, dtype=np.int64).reshape(-1, 2)
+        return cls(pairs[:, 0], pairs[:, 1])
+
+    def __len__(self) -> int:
+        return self.values.size
+
+
+def _columns(items: Union[List[Item], ItemArray]) -> Tuple[np.ndarray, ...]:
+    """
+    Values and weights of `items` as int64 arrays, without copying them when
+    they are already stored as such.
+    """
+    if isinstance(items, ItemArray):
+        return items.values, items.weights
+    pairs = np.array(items, dtype=np.int64).reshape(-1, 2)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def _pick(items: Union[List[Item], ItemArray], indices) -> list:
+    """
+    Identifiers of the items at `indices` for an `ItemArray`, or the items
+    themselves otherwise.
+    """
+    if isinstance(items, ItemArray):
+        return items.ids[indices].tolist()
+    return [items[index] for index in indices]
+
+
+def _density_order(values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    Indexes of the items sorted by decreasing value per unit of weight, with
+    weightless items first.
+    """
+    density = np.full(values.size, np.inf)
+    np.divide(values, weights, out=density, where=weights > 0)
+    return np.argsort(-density, kind="stable")
+
+
+class DenseTable:
+    """
+    Bottom-up knapsack table over a frozen array of items: a single row
+    indexed by capacity is rolled over the items with NumPy, and only one bit
+    per cell is kept to tell whether the item was taken, which is enough to
+    walk back the solution for any capacity up to the one of the table. Runs
+    in O(n * capacity) time and O(n * capacity / 8) memory, plus one row for
+    each checkpoint, from which the table is refilled when items are removed.
+
+    :param values:      Non-negative integer value of each item.
+    :param weights:     Non-negative integer weight of each item.
+    :param capacity:    Largest capacity that the table can answer.
+    :param checkpoints: Number of rows to keep along the items.
+    """
+
+    def __init__(self, values, weights, capacity: int, checkpoints: int = 0):
+        self.values = np.asarray(values, dtype=np.int64).tolist()
+        self.weights = np.asarray(weights, dtype=np.int64).tolist()
+        self.capacity = capacity
+        self.available = np.ones(len(self.values), dtype=bool)
+        self.step = len(self.values) // checkpoints + 1 if checkpoints else 0
+        self.saved = {}
+        self.taken = [None] * len(self.values)
+        self.best = None
+        self.cells = 0
+        self._fill(0, np.zeros(capacity + 1, dtype=np.int64))
+
+    def _fill(self, start: int, best: np.ndarray):
+        """
+        Roll `best`, the row before item `start`, over the remaining items.
+        """
+        capacity = self.capacity
+        for index in range(start, len(self.values)):
+            if self.step and not index % self.step:
+                self.saved[index] = best.copy()
+            weight = self.weights[index]
+            if not self.available[index] or weight > capacity:
+                self.taken[index] = None
+                continue
+            # the right-hand side is a fresh array, so the row read here is
+            # still the one from the previous item, as the recurrence requires
+            candidate = best[: capacity + 1 - weight] + self.values[index]
+            self.cells += candidate.size
+            take = candidate > best[weight:]
+            best[weight:] = np.where(take, candidate, best[weight:])
+            self.taken[index] = np.packbits(take)
+        self.best = best
+
+    def remove(self, indices: List[int]):
+        """
+        Mark items as unavailable, refilling the table from the last
+        checkpoint before the first of them.
+        """
+        self.available[indices] = False
+        first = min(indices)
+        start = first - first % self.step if self.step else 0
+        if start in self.saved:
+            self._fill(start, self.saved[start].copy())
+        else:
+            self._fill(0, np.zeros(self.capacity + 1, dtype=np.int64))
+
+    def solve(self, capacity: int) -> Tuple[int, List[int]]:
+        """
+        Walk the table back from `capacity`, which must not exceed the one of
+        the table, returning the best value and the indexes of its items.
+        """
+        result, tmp_max = [], capacity
+        for index in range(len(self.values) - 1, -1, -1):
+            weight = self.weights[index]
+            if self.taken[index] is None or tmp_max < weight:
+                continue
+            offset = tmp_max - weight
+            if self.taken[index][offset >> 3] >> (7 - (offset & 7)) & 1:
+                result.append(index)
+                tmp_max = offset
+
+        return int(self.best[capacity]), list(reversed(result))
+
+
+class SparseTable:
+    """
+    Knapsack solver that keeps only the Pareto frontier of reachable (weight,
+    value) states, i.e. the states for which no other state is both lighter
+    and at least as valuable. Each item shifts the frontier, which is merged
+    back with the previous one through a sort and a running maximum. The cost
+    depends on the size of the frontier instead of the capacity, which suits
+    huge capacities and few items. The interface matches `DenseTable`.
+
+    :param values:      Non-negative integer value of each item.
+    :param weights:     Non-negative integer weight of each item.
+    :param capacity:    Largest capacity that the table can answer.
+    """
+
+    def __init__(self, values, weights, capacity: int):
+        self.values = np.asarray(values, dtype=np.int64).tolist()
+        self.weights = np.asarray(weights, dtype=np.int64).tolist()
+        self.capacity = capacity
+        self.available = np.ones(len(self.values), dtype=bool)
+        self.frontier = None
+        self.history = None
+        self.states = 0
+        self._fill()
 
+    def _fill(self):
+        """
+        Merge every available item into the frontier, starting from the empty
+        knapsack.
+        """
+        capacity = self.capacity
+        # weights increase strictly along the frontier, and so do the values
+        weights = np.zeros(1, dtype=np.int64)
+        values = np.zeros(1, dtype=np.int64)
+        self.history = []
+
+        for index, (value, weight) in enumerate(
+            zip(self.values, self.weights)
+        ):
+            if not self.available[index] or weight > capacity:
+                self.history.append(None)
+                continue
+            fits = np.flatnonzero(weights + weight <= capacity)
+            all_weights = np.concatenate((weights, weights[fits] + weight))
+            all_values = np.concatenate((values, values[fits] + value))
+            parents = np.concatenate((np.arange(weights.size), fits))
+            take = np.arange(all_weights.size) >= weights.size
+            self.states += all_weights.size
+
+            # lighter first, and the most valuable among equal weights;
+            # lexsort is stable, so a state that skips the item wins a tie
+            order = np.lexsort((-all_values, all_weights))
+            all_values = all_values[order]
+            keep = np.empty(order.size, dtype=bool)
+            keep[0] = True
+            keep[1:] = all_values[1:] > np.maximum.accumulate(all_values)[:-1]
+
+            order = order[keep]
+            weights, values = all_weights[order], all_values[keep]
+            self.history.append((parents[order], take[order]))
+
+        self.frontier = weights, values
+
+    def remove(self, indices: List[int]):
+        """
+        Mark items as unavailable and rebuild the frontier.
+        """
+        self.available[indices] = False
+        self._fill()
+
+    def solve(self, capacity: int) -> Tuple[int, List[int]]:
+        """
+        Walk back from the most valuable state that fits in `capacity`,
+        returning its value and the indexes of its items.
+        """
+        weights, values = self.frontier
+        result = []
+        state = np.searchsorted(weights, capacity, side="right") - 1
+        value = values[state]
+
+        for index in range(len(self.values) - 1, -1, -1):
+            if self.history[index] is None:
+                continue
+            parents, take = self.history[index]
+            if take[state]:
+                result.append(index)
+            state = parents[state]
 
-def knapsack(items: List[Item], max_weight: int) -> Tuple[int, List[Item]]:
+        return int(value), list(reversed(result))
+
+
+def _table(values, weights, capacity: int, mode: str, checkpoints: int = 0):
+    """
+    Build the knapsack table for the items with the engine given by `mode`,
+    which is one of "dense", "sparse" or "auto". The automatic mode picks the
+    sparse one when the capacity is much larger than the number of items.
+    """
+    capacity = int(capacity)
+    if mode == "auto":
+        # the frontier never holds more than 2^n states, so a small item
+        # count bounds it regardless of the ratio below
+        sparse = capacity > SPARSE_CAPACITY_RATIO * len(values) or (
+            len(values) < capacity.bit_length()
+        )
+        mode = "sparse" if sparse else "dense"
+
+    if mode == "dense":
+        return DenseTable(values, weights, capacity, checkpoints)
+    if mode == "sparse":
+        return SparseTable(values, weights, capacity)
+    raise ValueError("unknown knapsack mode: {}".format(mode))
+
+
+def knapsack(
+    items: Union[List[Item], ItemArray],
+    max_weight: int,
+    mode: str = "auto",
+    stats: Optional[Stats] = None,
+) -> Tuple[int, list]:
     """Solve the knapsack problem by finding the most valuable subsequence
-    of items that weighs no more than a certain threshold. Based on [1].
+    of items that weighs no more than a certain threshold. Based on [1], with
+    two interchangeable engines: a dense table over every capacity, and a
+    sparse list of non-dominated states (see `DenseTable` and `SparseTable`).
 
     [1] https://codereview.stackexchange.com/a/20581
 
     :param items:       Pairs of non-negative integers in the form (value,
-                        weight).
+                        weight), or an `ItemArray`.
     :param max_weight:  Capacity of the knapsack as a non-negative integer.
+    :param mode:        One of "dense", "sparse" or "auto".
+    :param stats:       `Stats` that receives the cells filled by the dense
+                        engine or the states merged by the sparse one.
     :return:            The sum of values in the most valuable subsequence, and
-                        the subsequence itself.
+                        the subsequence itself, given by identifiers if the
+                        items came in an `ItemArray`.
 
     >>> items = [Item(4, 12), Item(2, 1), Item(6, 4), Item(1, 1), Item(2, 2)]
     >>> knapsack(items, 15)
@@ -38,41 +331,213 @@ def knapsack(items: List[Item], max_weight: int) -> Tuple[int, List[Item]]:
       Item(value=6, weight=4),
       Item(value=1, weight=1),
       Item(value=2, weight=2)])
+    >>> knapsack(ItemArray.from_items(items), 15)
+    (11, [1, 2, 3, 4])
     """
+    if max_weight < 0:
+        return 0, []
 
-    @lru_cache(maxsize=None)
-    def best_value(i: int, j: int) -> int:
-        """
-        Return the value of the most valuable subsequence of the first
-        `i` elements in `items` whose weights sum no more than `j`.
-        """
-        if j < 0:
-            return -maxsize - 1
-        if i == 0:
-            return 0
-        value, weight = items[i - 1]
-        return max(best_value(i - 1, j), best_value(i - 1, j - weight) + value)
+    table = _table(*_columns(items), max_weight, mode)
+    value, result = table.solve(max_weight)
+    if stats is not None:
+        if isinstance(table, DenseTable):
+            stats.count("cells", table.cells)
+        else:
+            stats.count("states", table.states)
+        stats.export("knapsack")
+    return value, _pick(items, result)
 
-    n_items = len(items)
-    tmp_max = max_weight
-    result = []
 
-    for index in range(n_items - 1, 0, -1):
-        if best_value(index + 1, tmp_max) != best_value(index, tmp_max):
-            result.append(items[index])
-            tmp_max -= items[index].weight
+class _LinearBound:
+    """
+    Linear relaxation of the knapsack problem over the items taken in order
+    of decreasing density, answering the bound for any suffix of that order
+    and any residual capacity in logarithmic time through prefix sums.
+    """
+
+    def __init__(self, values: List[int], weights: List[int]):
+        self.values = [0] + list(accumulate(values))
+        self.weights = [0] + list(accumulate(weights))
+
+    def __call__(self, start: int, capacity: int) -> float:
+        limit = self.weights[start] + capacity
+        stop = bisect_right(self.weights, limit, lo=start) - 1
+        bound = self.values[stop] - self.values[start]
+        if stop + 1 < len(self.weights):
+            rest = limit - self.weights[stop]
+            value = self.values[stop + 1] - self.values[stop]
+            bound += (
+                value * rest / (self.weights[stop + 1] - self.weights[stop])
+            )
+        return bound
+
+
+def _gap(value: int, bound: float) -> float:
+    """
+    Relative distance between a value and an upper bound on the optimum.
+    """
+    return max(0.0, (bound - value) / bound) if bound > 0 else 0.0
+
+
+def fptas_knapsack(
+    items: Union[List[Item], ItemArray], max_weight: int, epsilon: float
+) -> Approximation:
+    """
+    Fully polynomial-time approximation scheme for the knapsack problem: the
+    values are divided by `epsilon * L / n` and rounded down, where `L` is
+    half of the linear relaxation and thus a lower bound on the optimum, and
+    a table indexed by scaled value keeps the lightest way of reaching each
+    one. The result is worth at least `1 - epsilon` of the optimum, and,
+    whatever the capacity, each row of the table has at most `2n / epsilon`
+    cells, so the n rows of bits kept to walk back the solution hold about
+    `2n^2 / epsilon` cells, and the time is of the same order.
+
+    :param items:       Pairs of non-negative integers in the form (value,
+                        weight), or an `ItemArray`.
+    :param max_weight:  Capacity of the knapsack as a non-negative integer.
+    :param epsilon:     Tolerated relative loss, between 0 and 1.
+    :return:            The value and the items of the solution, and the
+                        proven relative gap to the optimum.
+    """
+    assert 0 < epsilon < 1
+
+    values, weights = _columns(items)
+    fitting = np.flatnonzero((weights <= max_weight) & (values > 0))
+    if max_weight < 0 or not fitting.size:
+        return Approximation(0, [], 0.0)
+
+    values, weights = values[fitting], weights[fitting]
+    order = _density_order(values, weights)
+    upper = _LinearBound(values[order].tolist(), weights[order].tolist())(
+        0, max_weight
+    )
+    scale = max(1.0, epsilon * upper / 2 / fitting.size)
+    scaled = (values // scale).astype(np.int64)
+    # no feasible set of items is worth more than the relaxation
+    total = min(int(scaled.sum()), int(upper / scale))
+
+    lightest = np.full(total + 1, max_weight + 1, dtype=np.int64)
+    lightest[0] = 0
+    taken = []
+    for value, weight in zip(scaled.tolist(), weights.tolist()):
+        candidate = lightest[: total + 1 - value] + weight
+        take = candidate < lightest[value:]
+        lightest[value:] = np.where(take, candidate, lightest[value:])
+        taken.append(np.packbits(take))
 
-    return best_value(n_items, max_weight), list(reversed(result))
+    result, target = [], int(np.flatnonzero(lightest <= max_weight)[-1])
+    for index in range(fitting.size - 1, -1, -1):
+        offset = target - int(scaled[index])
+        if offset < 0 or not taken[index].size:
+            continue
+        if taken[index][offset >> 3] >> (7 - (offset & 7)) & 1:
+            result.append(index)
+            target = offset
+    result.reverse()
 
+    found = int(values[result].sum())
+    # without scaling the table is exact, otherwise the scheme guarantees
+    # that the optimum is at most found / (1 - epsilon)
+    if scale == 1.0:
+        upper = found
+    upper = min(upper, found / (1 - epsilon))
+    return Approximation(
+        found, _pick(items, fitting[result]), _gap(found, upper)
+    )
 
-def mkp(items: List[Item], trucks: List[int]) -> Dict[int, Set[Item]]:
+
+def anytime_knapsack(
+    items: Union[List[Item], ItemArray], max_weight: int, time_limit: float
+) -> Iterator[Approximation]:
+    """
+    Anytime solver for the knapsack problem. The greedy solution by density
+    is yielded at once, and then a depth-first branch-and-bound search with
+    the linear relaxation as bound yields every improvement until it either
+    proves the last one optimal, with a gap of zero, or reaches the deadline.
+
+    :param items:       Pairs of non-negative integers in the form (value,
+                        weight), or an `ItemArray`.
+    :param max_weight:  Capacity of the knapsack as a non-negative integer.
+    :param time_limit:  Number of seconds after which to stop improving.
+    :return:            Successively better solutions, each with the proven
+                        relative gap to the optimum.
+    """
+    deadline = perf_counter() + time_limit
+    values, weights = _columns(items)
+    fitting = np.flatnonzero((weights <= max_weight) & (values > 0))
+    if max_weight < 0 or not fitting.size:
+        yield Approximation(0, [], 0.0)
+        return
+
+    order = fitting[_density_order(values[fitting], weights[fitting])]
+    values, weights = values[order].tolist(), weights[order].tolist()
+    bound = _LinearBound(values, weights)
+    upper = bound(0, max_weight)
+
+    # greedy by density, or the most valuable item alone if that is better
+    best, chosen, capacity = 0, [], max_weight
+    for index, (value, weight) in enumerate(zip(values, weights)):
+        if weight <= capacity:
+            best, capacity = best + value, capacity - weight
+            chosen.append(index)
+    top = max(range(len(values)), key=values.__getitem__)
+    if values[top] > best:
+        best, chosen = values[top], [top]
+    yield Approximation(best, _pick(items, order[chosen]), _gap(best, upper))
+
+    # nodes hold the next item to decide, the value and residual capacity so
+    # far, and the chosen items as a linked list of (index, rest)
+    stack, nodes = [(0, 0, max_weight, None)], 0
+    while stack:
+        nodes += 1
+        if not nodes & 0xFF and perf_counter() > deadline:
+            return
+        depth, value, capacity, trail = stack.pop()
+        if value > best:
+            best, chosen, link = value, [], trail
+            while link is not None:
+                chosen.append(link[0])
+                link = link[1]
+            chosen.reverse()
+            yield Approximation(
+                best, _pick(items, order[chosen]), _gap(best, upper)
+            )
+        if depth == len(values) or value + bound(depth, capacity) < best + 1:
+            continue
+        stack.append((depth + 1, value, capacity, trail))
+        if weights[depth] <= capacity:
+            stack.append(
+                (
+                    depth + 1,
+                    value + values[depth],
+                    capacity - weights[depth],
+                    (depth, trail),
+                )
+            )
+
+    yield Approximation(best, _pick(items, order[chosen]), 0.0)
+
+
+def mkp(
+    items: Union[List[Item], ItemArray],
+    trucks: List[int],
+    ordered: bool = False,
+) -> Dict[int, set]:
     """
     Rough solutions to the multiple 0-1 knapsack problem using a greedy
-    approach, i.e. the hardest knapsack to fill goes first.
+    approach, i.e. the hardest knapsack to fill goes first. A single table is
+    built for the largest truck over the items sorted by increasing density,
+    and each truck is answered from it. Chosen items are then marked as
+    unavailable, and since the densest items tend to be the ones chosen, the
+    table is refilled only from a checkpoint near the end.
 
     :param trucks:  Integers that represent the capacity of each knapsack.
-    :param items:   Pairs of non-negative integers in the form (value, weight).
-    :return:        The listing of items inside each knapsack, or truck.
+    :param items:   Pairs of non-negative integers in the form (value, weight),
+                    or an `ItemArray`.
+    :param ordered: Whether to fill the trucks in the given order instead of
+                    smallest first.
+    :return:        The listing of items inside each knapsack, or truck, given
+                    by identifiers if the items came in an `ItemArray`.
 
     >>> trucks = [5, 7, 8]
     >>> items = [Item(5, 3), Item(10, 8), Item(8, 7), Item(7, 5)]
@@ -80,15 +545,337 @@ def mkp(items: List[Item], trucks: List[int]) -> Dict[int, Set[Item]]:
     {5: {Item(value=7, weight=5)},
      7: {Item(value=8, weight=7)},
      8: {Item(value=10, weight=8)}}
+    >>> mkp(ItemArray.from_items(items), trucks)
+    {5: {3}, 7: {2}, 8: {1}}
     """
     solution = defaultdict(set)
+    if not len(items) or not trucks:
+        return {}
 
-    for capacity in sorted(trucks):
-        _, result = knapsack(items, capacity)
+    values, weights = _columns(items)
+    frozen = _density_order(values, weights)[::-1]
+    table = _table(
+        values[frozen], weights[frozen], max(trucks), "auto", MKP_CHECKPOINTS
+    )
+
+    for capacity in trucks if ordered else sorted(trucks):
+        _, result = table.solve(capacity)
         if result:
-            solution[capacity] = set(result)
-        for used_item in result:
-            items.remove(used_item)
+            solution[capacity] = set(_pick(items, frozen[result]))
+            table.remove(result)
+
+    return dict(solution)
+
+
+def total_value(solution: Dict[int, Set[Item]]) -> int:
+    """
+    Sum of the values of every item loaded in a solution.
+
+    :param solution:    The listing of items inside each knapsack, or truck.
+    :return:            The total value carried by the trucks.
+    """
+    return sum(sum(item.value for item in load) for load in solution.values())
+
+
+def mkp_batch(
+    instances: List[Tuple[List[Item], List[int]]],
+    workers: int = None,
+    solver: Callable = mkp,
+) -> List[Dict[int, Set[Item]]]:
+    """
+    Solve independent multiple knapsack instances on a pool of processes.
+    Each worker receives its own copy of the items, so the instances given
+    are never modified.
+
+    :param instances:   Pairs of items and truck capacities.
+    :param workers:     Number of processes, or None for one per core.
+    :param solver:      Module-level function with the signature of `mkp`.
+    :return:            The solution of each instance, in the same order.
+    """
+    if not instances:
+        return []
+
+    items, trucks = zip(*instances)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(solver, items, trucks))
+
+
+def speculative_mkp(
+    items: List[Item],
+    trucks: List[int],
+    samples: int = 8,
+    workers: int = None,
+    seed: int = 0,
+) -> Dict[int, Set[Item]]:
+    """
+    Run the greedy `mkp` on several orderings of the trucks in parallel and
+    keep the most valuable result. The candidates are the increasing and
+    decreasing orders of capacity, plus a number of random permutations
+    drawn from a fixed seed.
+
+    :param items:   Pairs of non-negative integers in the form (value, weight).
+    :param trucks:  Integers that represent the capacity of each knapsack.
+    :param samples: Number of random permutations to try.
+    :param workers: Number of processes, or None for one per core.
+    :param seed:    Seed for the random permutations.
+    :return:        The listing of items inside each knapsack, or truck.
+    """
+    orderings = {tuple(sorted(trucks)), tuple(sorted(trucks, reverse=True))}
+    generator = Random(seed)
+    for _ in range(samples):
+        orderings.add(tuple(generator.sample(trucks, len(trucks))))
+
+    orderings = sorted(orderings)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        solutions = executor.map(mkp, repeat(items), orderings, repeat(True))
+        return max(solutions, key=total_value)
+
+
+def _dantzig_bound(
+    items: List[Item], order: List[int], start: int, residual: List[int]
+) -> float:
+    """
+    Upper bound on the value that the items in `order[start:]` can add to a
+    partial solution, obtained by merging the residual capacities of every
+    knapsack into a single one (surrogate relaxation) and solving its linear
+    relaxation greedily. Items that fit in no knapsack are ignored.
+    """
+    capacity, largest = sum(residual), max(residual)
+    bound = 0.0
+
+    for index in order[start:]:
+        value, weight = items[index]
+        if weight > largest:
+            continue
+        if weight > capacity:
+            return bound + value * capacity / weight
+        capacity -= weight
+        bound += value
+
+    return bound
+
+
+def upper_bound(items: List[Item], trucks: List[int]) -> int:
+    """
+    Upper bound on the optimal value of the multiple 0-1 knapsack problem,
+    useful to measure the quality of any solution.
+
+    :param items:   Pairs of non-negative integers in the form (value, weight).
+    :param trucks:  Integers that represent the capacity of each knapsack.
+    :return:        An integer no smaller than the optimal total value.
+    """
+    if not items or not trucks:
+        return 0
+    order = _density_order(*_columns(items)).tolist()
+    return int(_dantzig_bound(items, order, 0, list(trucks)))
+
+
+def exact_mkp(
+    items: List[Item],
+    trucks: List[int],
+    max_nodes: int = 0,
+    time_limit: float = 0.0,
+) -> Dict[int, Set[Item]]:
+    """
+    Depth-first branch-and-bound for the multiple 0-1 knapsack problem. Items
+    are decided in order of decreasing density, first trying every truck with
+    a distinct residual capacity and then leaving the item out. Nodes whose
+    surrogate linear relaxation cannot beat the incumbent are pruned. The
+    search starts from the greedy solution of `mkp`, and if a budget is given
+    and runs out, the best incumbent found so far is returned instead of a
+    proven optimum.
+
+    :param items:       Pairs of non-negative integers in the form (value,
+                        weight).
+    :param trucks:      Integers that represent the capacity of each knapsack.
+    :param max_nodes:   Maximum number of nodes to explore, or 0 for no limit.
+    :param time_limit:  Maximum number of seconds to search, or 0 for no limit.
+    :return:            The listing of items inside each knapsack, or truck.
+
+    >>> trucks = [5, 7, 8]
+    >>> items = [Item(5, 3), Item(10, 8), Item(8, 7), Item(7, 5)]
+    >>> exact_mkp(items, trucks)
+    {5: {Item(value=7, weight=5)},
+     7: {Item(value=8, weight=7)},
+     8: {Item(value=10, weight=8)}}
+    """
+    if not items or not trucks:
+        return {}
+
+    order = _density_order(*_columns(items)).tolist()
+    deadline = perf_counter() + time_limit if time_limit else 0.0
+
+    # the greedy solution is a cheap first incumbent
+    incumbent = mkp(items, trucks)
+    best_value = sum(sum(i.value for i in load) for load in incumbent.values())
+    best_trail, improved = None, False
+
+    # nodes hold the next item to decide, the value and residual capacities
+    # so far, and the placements as a linked list of (index, truck, rest);
+    # children are pushed in reverse, so that trucks are tried before the skip
+    stack, nodes = [(0, 0, tuple(trucks), None)], 0
+    while stack:
+        nodes += 1
+        if (max_nodes and nodes > max_nodes) or (
+            deadline and not nodes & 0xFF and perf_counter() > deadline
+        ):
+            break
+        depth, value, residual, trail = stack.pop()
+
+        if value > best_value:
+            best_value, best_trail, improved = value, trail, True
+        if depth == len(order):
+            continue
+        if value + _dantzig_bound(items, order, depth, residual) < (
+            best_value + 1
+        ):
+            continue
+
+        index = order[depth]
+        weight, tried, children = items[index].weight, set(), []
+        for truck, capacity in enumerate(residual):
+            if capacity < weight or capacity in tried:
+                continue
+            tried.add(capacity)
+            children.append(
+                (
+                    depth + 1,
+                    value + items[index].value,
+                    residual[:truck]
+                    + (capacity - weight,)
+                    + residual[truck + 1 :],
+                    (index, truck, trail),
+                )
+            )
+        stack.append((depth + 1, value, residual, trail))
+        stack.extend(reversed(children))
+
+    if not improved:
+        return incumbent
+
+    solution = defaultdict(set)
+    while best_trail is not None:
+        index, truck, best_trail = best_trail
+        solution[trucks[truck]].add(items[index])
+
+    return dict(solution)
+
+
+@lru_cache(maxsize=None)
+def _load_mtm():
+    """
+    Load the shared library built by `make lib` once per process, and
+    declare the signature of its entry point.
+    """
+    int_array = np.ctypeslib.ndpointer(dtype=np.int32, flags="C_CONTIGUOUS")
+    function = ctypes.CDLL(MTM_LIBRARY).mtm_c
+    function.restype = None
+    function.argtypes = [
+        ctypes.c_int,
+        ctypes.c_int,
+        int_array,
+        int_array,
+        int_array,
+        ctypes.POINTER(ctypes.c_int),
+        int_array,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.POINTER(ctypes.c_int),
+    ]
+    return function
+
+
+def mtm_mkp(
+    items: Union[List[Item], ItemArray],
+    trucks: List[int],
+    backtracks: int = -1,
+) -> Dict[int, set]:
+    """
+    Optimal solutions to the multiple 0-1 knapsack problem given by the MTM
+    routine from Martello and Toth, called in-process through the shared
+    library built by `make lib`. The input is rearranged as MTM expects,
+    i.e. items by decreasing density and knapsacks by increasing capacity,
+    and trivial instances that MTM rejects are solved beforehand. MTM
+    handles at most 1000 items and 10 knapsacks, and since it works on C
+    ints, every value, weight and capacity, as well as the sum of the values,
+    must fit in 32 bits.
+
+    :param items:       Pairs of non-negative integers in the form (value,
+                        weight), or an `ItemArray`.
+    :param trucks:      Integers that represent the capacity of each knapsack.
+    :param backtracks:  Maximum number of backtrackings to perform, or -1 for
+                        an exact solution.
+    :return:            The listing of items inside each knapsack, or truck,
+                        given by identifiers if the items came in an
+                        `ItemArray`.
+    """
+    solution = defaultdict(set)
+    if not len(items) or not trucks:
+        return {}
+
+    pairs = np.stack(_columns(items), axis=1)
+    limits = np.iinfo(np.int32)
+    if (
+        pairs.min() < limits.min
+        or pairs.max() > limits.max
+        or pairs[:, 0].clip(0).sum() > limits.max
+        or min(trucks) < limits.min
+        or max(trucks) > limits.max
+    ):
+        raise ValueError("MTM only takes integers that fit in 32 bits")
+    pairs = pairs.astype(np.int32)
+    capacities = np.sort(np.array(trucks, dtype=np.int32))
+    largest = int(capacities[-1])
+
+    # MTM wants positive profits and weights, every item fitting somewhere
+    # and every knapsack fitting something
+    free = np.flatnonzero((pairs[:, 1] == 0) & (pairs[:, 0] > 0))
+    if free.size:
+        solution[largest].update(_pick(items, free))
+    useful = np.flatnonzero(
+        (pairs[:, 0] > 0) & (pairs[:, 1] > 0) & (pairs[:, 1] <= largest)
+    )
+    if not useful.size:
+        return dict(solution)
+    capacities = capacities[capacities >= pairs[useful, 1].min()]
+
+    if pairs[useful, 1].sum() <= largest:
+        solution[largest].update(_pick(items, useful))
+        return dict(solution)
+    if capacities.size == 1:
+        capacity = int(capacities[0])
+        table = _table(pairs[useful, 0], pairs[useful, 1], capacity, "auto")
+        _, result = table.solve(capacity)
+        solution[capacity].update(_pick(items, useful[result]))
+        return dict(solution)
+
+    useful = useful[
+        np.argsort(-pairs[useful, 0] / pairs[useful, 1], kind="stable")
+    ]
+    values = np.ascontiguousarray(pairs[useful, 0])
+    weights = np.ascontiguousarray(pairs[useful, 1])
+    placement = np.zeros(useful.size + 1, dtype=np.int32)
+    total, bound = ctypes.c_int(0), ctypes.c_int(0)
+
+    _load_mtm()(
+        useful.size,
+        capacities.size,
+        values,
+        weights,
+        capacities,
+        ctypes.byref(total),
+        placement,
+        backtracks,
+        1,
+        ctypes.byref(bound),
+    )
+    if total.value < 0:
+        raise ValueError("MTM rejected the input: {}".format(total.value))
+
+    for truck in np.unique(placement[: useful.size]):
+        if truck:
+            chosen = useful[placement[: useful.size] == truck]
+            solution[int(capacities[truck - 1])].update(_pick(items, chosen))
 
     return dict(solution)
 
@@ -249,6 +1036,15 @@ def known_tests_single():
         profit = sum(
             item.value for item, present in zip(item, opt) if int(present)
         )
+        stats = Stats()
+        optimum = knapsack(item, truck, "sparse", stats)[0]
+        assert knapsack(item, truck, "dense", stats)[0] == optimum
+        assert knapsack(item, np.int64(truck))[0] == optimum
+        assert stats["cells"] <= len(item) * (truck + 1)
+        assert 0 < stats["states"] <= len(item) << len(item)
+        assert fptas_knapsack(item, truck, 0.1).value >= 0.9 * optimum
+        *_, last = anytime_knapsack(item, truck, 1.0)
+        assert last.gap == 0.0 and last.value == optimum
         solution = mkp(item, [truck])
         sol_values = sum(
             sum(item.value for item in _set) for _set in solution.values()
@@ -322,16 +1118,51 @@ def known_tests_multiple():
         ["1010010000", "0001100010"],
     ]
 
-    for truck, item, opt in zip(trucks, items, optimal):
+    batch = mkp_batch(list(zip(items, trucks)), solver=exact_mkp)
+
+    for truck, item, opt, exact in zip(trucks, items, optimal, batch):
         profit = sum(
             sum(i.value for i, j in zip(item, o) if int(j)) for o in opt
         )
+        assert total_value(exact) == total_value(exact_mkp(item, truck))
+        assert total_value(speculative_mkp(item, truck)) >= total_value(
+            mkp(item, truck)
+        )
+        # the listed placements are not always optimal, hence the inequality
+        assert profit <= sum(
+            sum(item.value for item in _set) for _set in exact.values()
+        )
+        if path.exists(MTM_LIBRARY):
+            assert sum(
+                sum(item.value for item in _set) for _set in exact.values()
+            ) == sum(
+                sum(item.value for item in _set)
+                for _set in mtm_mkp(item, truck).values()
+            )
         solution = mkp(item, truck)
         sol_values = sum(
             sum(item.value for item in _set) for _set in solution.values()
         )
         print("{:>7.2%} of optimal profit".format(sol_values / profit))
 
+    # an instance deeper than the recursion limit, cut short by the deadline
+    rand = Random(0)
+    item = [
+        Item(rand.randint(1, 1000), rand.randint(1, 1000)) for _ in range(3000)
+    ]
+    truck = [5000, 7000, 9000]
+    value = total_value(exact_mkp(item, truck, time_limit=0.5))
+    assert total_value(mkp(item, truck)) <= value <= upper_bound(item, truck)
+
+    # values beyond a C int are refused before reaching MTM
+    for item, truck in [([Item(1 << 31, 1)], [10]), ([Item(1, 1)], [1 << 31])]:
+        try:
+            mtm_mkp(item, truck)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("MTM took {} and {}".format(item, truck))
+
 
 if __name__ == "__main__":
     known_tests_single()
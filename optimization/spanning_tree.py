@@ -12,9 +12,141 @@ cities.
 
 from __future__ import absolute_import
 
+import os
+from array import array
 from collections import defaultdict
+from heapq import merge
+from itertools import islice
+from operator import itemgetter
 from random import randint
-from typing import Set, Tuple
+from tempfile import TemporaryDirectory
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from instrumentation import Stats
+
+# total order on edges, by cost and then by ends, which makes the minimum
+# spanning tree unique and thus the same for every engine
+edge_key = itemgetter(2, 0, 1)
+
+# fraction of all vertex pairs above which a graph is deemed dense
+DENSE_RATIO = 0.25
+
+# number of edges above which sparse graphs are left to Borůvka
+BORUVKA_MIN_EDGES = 1 << 16
+
+# record of an edge in the files read by `read_edges`
+EDGE_DTYPE = np.dtype([("tail", "<i4"), ("head", "<i4"), ("cost", "<f8")])
+
+# number of edges read and sorted at once by `external_kruskal`
+EDGE_CHUNK = 1 << 20
+
+# number of sorted runs merged at once by `external_kruskal`, each one with
+# a file open, which keeps well below the usual limit of open files
+MERGE_FANIN = 64
+
+# number of edges turned into Python objects at once by `EdgeArray` users
+EDGE_BLOCK = 1 << 16
+
+
+class DisjointSet:
+    """
+    Disjoint-set forest from CLRS (Introduction to Algorithms, Section 21.3),
+    with union by rank and path compression, over the integers from zero to
+    `size - 1`. Any sequence of operations runs in nearly linear time.
+
+    :param size:    Number of elements, each starting in its own set.
+    """
+
+    def __init__(self, size: int):
+        self.parent = array("q", range(size))
+        self.rank = bytearray(size)
+
+    def find(self, item: int) -> int:
+        """
+        Representative of the set of `item`, pointing every element on the
+        way straight to it.
+        """
+        parent = self.parent
+        root = item
+        while parent[root] != root:
+            root = parent[root]
+        while parent[item] != root:
+            parent[item], item = root, parent[item]
+        return root
+
+    def union(self, first: int, second: int) -> bool:
+        """
+        Merge the sets of two elements, hanging the shallower tree below the
+        root of the deeper one.
+
+        :return:    Whether the elements were in different sets.
+        """
+        first, second = self.find(first), self.find(second)
+        if first == second:
+            return False
+        if self.rank[first] < self.rank[second]:
+            first, second = second, first
+        self.parent[second] = first
+        if self.rank[first] == self.rank[second]:
+            self.rank[first] += 1
+        return True
+
+
+class EdgeArray:
+    """
+    Struct-of-arrays container for the edges of a graph, with their ends in
+    contiguous int32 arrays and their costs in a float64 one, which takes a
+    fraction of the memory of a set of tuples. It iterates over the edges as
+    tuples, so `Graph` accepts it in place of such a set.
+
+    :param tails:   First end of each edge.
+    :param heads:   Second end of each edge.
+    :param costs:   Cost of each edge.
+    """
+
+    def __init__(self, tails, heads, costs):
+        self.tails = np.ascontiguousarray(tails, dtype=np.int32)
+        self.heads = np.ascontiguousarray(heads, dtype=np.int32)
+        self.costs = np.ascontiguousarray(costs, dtype=np.float64)
+        assert self.tails.shape == self.heads.shape == self.costs.shape
+
+    @classmethod
+    def from_edges(
+        cls, edges: Iterable[Tuple[int, int, float]]
+    ) -> "EdgeArray":
+        """
+        Pack edges given as tuples, in the order they are iterated.
+        """
+        records = np.array(list(edges), dtype=EDGE_DTYPE)
+        return cls(records["tail"], records["head"], records["cost"])
+
+    def __len__(self) -> int:
+        return self.costs.size
+
+    def __iter__(self) -> Iterator[Tuple[int, int, float]]:
+        for start in range(0, len(self), EDGE_BLOCK):
+            end = start + EDGE_BLOCK
+            yield from zip(
+                self.tails[start:end].tolist(),
+                self.heads[start:end].tolist(),
+                self.costs[start:end].tolist(),
+            )
+
+    def to_set(self, indices=None) -> Set[Tuple[int, int, float]]:
+        """
+        Edges at `indices`, or all of them, as a set of tuples.
+        """
+        if indices is None:
+            return set(self)
+        return set(
+            zip(
+                self.tails[indices].tolist(),
+                self.heads[indices].tolist(),
+                self.costs[indices].tolist(),
+            )
+        )
 
 
 class Graph:
@@ -22,12 +154,13 @@ class Graph:
     Graph class to improve algorithm implementation.
 
     :param v:   List of vertexes.
-    :param e:   List of edges.
+    :param e:   List of edges, or an `EdgeArray` holding them.
     """
     vertex = Set[int]
     v_size = 0
     edges = Set[Tuple[int, int, float]]
     e_size = 0
+    forest = None
 
     def __init__(self, v, e):
         self.vertex = v
@@ -35,12 +168,17 @@ class Graph:
         self.v_size = len(v)
         self.e_size = len(e)
 
-    def kruskal(self) -> Set[Tuple[int, int, float]]:
+    def kruskal(
+        self, stats: Optional[Stats] = None
+    ) -> Set[Tuple[int, int, float]]:
         """
         Kruskal's algorithm from CLRS (Introduction to Algorithms, Section
-        23.2), using the Timsort algorithm.
+        23.2), using the Timsort algorithm and a disjoint-set forest, and
+        stopping as soon as the tree spans every vertex.
 
         :param graph:   Graph structure used to find the minimal spanning tree.
+        :param stats:   `Stats` that receives the unions attempted, each made
+                        of two finds, and the ones that merged two trees.
         :return:        List of edges that form the minimum spanning tree.
         """
         if self.v_size == 0:
@@ -49,22 +187,362 @@ class Graph:
         if self.e_size == 0:
             return self.vertex
 
+        if isinstance(self.edges, EdgeArray):
+            return self.edges.to_set(self.kruskal_indices(stats))
+
         minimal_edges_set = set()
-        vertex_sets = [{x} for x in range(self.v_size)]
-        edges_sorted = sorted(self.edges, key=lambda tup: tup[2])
+        components = DisjointSet(self.v_size)
+        edges_sorted = sorted(self.edges, key=edge_key)
+        tried = 0
 
-        for edge in edges_sorted:
-            if vertex_sets[edge[0]] != vertex_sets[edge[1]]:
+        for tried, edge in enumerate(edges_sorted, 1):
+            if components.union(edge[0], edge[1]):
                 minimal_edges_set.add(edge)
+                if len(minimal_edges_set) == self.v_size - 1:
+                    break
 
-                tmp_vertex_set = vertex_sets[edge[0]].union(
-                    vertex_sets[edge[1]]
-                )
-                for vertex in tmp_vertex_set:
-                    vertex_sets[vertex] = tmp_vertex_set
+        if stats is not None:
+            _count_unions(stats, tried, len(minimal_edges_set))
+            stats.export("kruskal")
 
         return minimal_edges_set
 
+    def kruskal_indices(self, stats: Optional[Stats] = None) -> np.ndarray:
+        """
+        Kruskal's algorithm over the edges packed in an `EdgeArray`, which
+        are sorted at once by NumPy and handed to the disjoint-set forest in
+        blocks. Edges stored as tuples are packed into a copy first, in the
+        order they are iterated, which `self.edges` is left in.
+
+        :param stats:   `Stats` that receives the same counters as in
+                        `kruskal`.
+        :return:        Positions in `self.edges` of the edges that form the
+                        minimum spanning tree, in increasing order of cost.
+        """
+        if self.v_size == 0:
+            return np.empty(0, dtype=np.int64)
+
+        edges = self.edges
+        if not isinstance(edges, EdgeArray):
+            edges = EdgeArray.from_edges(edges)
+        order = np.lexsort((edges.heads, edges.tails, edges.costs))
+        components = DisjointSet(self.v_size)
+        chosen = array("q")
+        tried = 0
+
+        for start in range(0, order.size, EDGE_BLOCK):
+            block = order[start : start + EDGE_BLOCK]
+            tried += block.size
+            for index, tail, head in zip(
+                block.tolist(),
+                edges.tails[block].tolist(),
+                edges.heads[block].tolist(),
+            ):
+                if components.union(tail, head):
+                    chosen.append(index)
+            if len(chosen) >= self.v_size - 1:
+                break
+
+        if stats is not None:
+            _count_unions(stats, tried, len(chosen))
+            stats.export("kruskal_indices")
+
+        return np.frombuffer(chosen, dtype=np.int64)
+
+    def _ranked(self):
+        """
+        Edges packed in arrays, the position of each one in the order given
+        by `edge_key`, and a function that turns indices into `self.edges`
+        back into the edges themselves.
+        """
+        if isinstance(self.edges, EdgeArray):
+            packed = self.edges
+            unpack = packed.to_set
+        else:
+            edges = list(self.edges)
+            packed = EdgeArray.from_edges(edges)
+
+            def unpack(indices):
+                return {edges[index] for index in indices.tolist()}
+
+        order = np.lexsort((packed.heads, packed.tails, packed.costs))
+        rank = np.empty_like(order)
+        rank[order] = np.arange(order.size)
+        return packed, order, rank, unpack
+
+    def prim(self) -> Set[Tuple[int, int, float]]:
+        """
+        Prim's algorithm from CLRS (Introduction to Algorithms, Section 23.2),
+        in its array form for dense graphs: the cheapest edge between every
+        pair of vertexes is kept in a matrix, and each step takes the vertex
+        closest to the tree with a single scan of a NumPy row, in O(V^2) time
+        overall. A new tree is grown whenever no edge leaves the current one,
+        so that it also spans disconnected graphs.
+
+        :return:    List of edges that form the minimum spanning tree.
+        """
+        if self.v_size == 0:
+            return set()
+
+        if self.e_size == 0:
+            return self.vertex
+
+        packed, order, rank, unpack = self._ranked()
+        tails, heads = packed.tails, packed.heads
+        # edges are compared by rank, and `none` stands for no edge at all
+        none = order.size
+        links = tails != heads
+        closest = np.full((self.v_size, self.v_size), none)
+        np.minimum.at(closest, (tails[links], heads[links]), rank[links])
+        np.minimum.at(closest, (heads[links], tails[links]), rank[links])
+
+        visited = np.zeros(self.v_size, dtype=bool)
+        distance = np.full(self.v_size, none)
+        chosen = []
+        for _ in range(self.v_size):
+            vertex = np.argmin(np.where(visited, none + 1, distance))
+            if distance[vertex] < none:
+                chosen.append(distance[vertex])
+            visited[vertex] = True
+            np.minimum(distance, closest[vertex], out=distance)
+
+        return unpack(order[np.array(chosen, dtype=np.int64)])
+
+    def boruvka(self) -> Set[Tuple[int, int, float]]:
+        """
+        Borůvka's algorithm, where in each round every component picks its
+        cheapest outgoing edge, found for all of them at once with NumPy, and
+        the components are merged along the picks by pointer jumping. There
+        are at most log V rounds.
+
+        :return:    List of edges that form the minimum spanning tree.
+        """
+        if self.v_size == 0:
+            return set()
+
+        if self.e_size == 0:
+            return self.vertex
+
+        packed, order, rank, unpack = self._ranked()
+        tails, heads = packed.tails, packed.heads
+
+        label = np.arange(self.v_size)
+        chosen = [np.empty(0, dtype=np.int64)]
+        while True:
+            first, second = label[tails], label[heads]
+            crossing = first != second
+            if not crossing.any():
+                break
+            cheapest = np.full(self.v_size, order.size)
+            np.minimum.at(cheapest, first[crossing], rank[crossing])
+            np.minimum.at(cheapest, second[crossing], rank[crossing])
+
+            picking = np.flatnonzero(cheapest < order.size)
+            picked = order[cheapest[picking]]
+            chosen.append(np.unique(picked))
+
+            # hook each component to the other end of its pick, undo the
+            # two-cycles made by components picking the same edge, and jump
+            hook = np.arange(self.v_size)
+            ends = label[tails[picked]]
+            hook[picking] = np.where(
+                ends == picking, label[heads[picked]], ends
+            )
+            roots = picking[
+                (hook[hook[picking]] == picking) & (picking < hook[picking])
+            ]
+            hook[roots] = roots
+            while (hook != hook[hook]).any():
+                hook = hook[hook]
+            label = hook[label]
+
+        return unpack(np.concatenate(chosen))
+
+    def spanning_tree(self) -> Set[Tuple[int, int, float]]:
+        """
+        Minimum spanning tree by the engine that suits the density of the
+        graph: the O(V^2) array form of Prim's algorithm for dense graphs,
+        Borůvka's for large sparse ones, and Kruskal's otherwise. Since ties
+        are broken by `edge_key`, every engine returns the same edges.
+
+        :return:    List of edges that form the minimum spanning tree.
+        """
+        pairs = self.v_size * (self.v_size - 1) // 2
+        if self.e_size >= DENSE_RATIO * pairs:
+            return self.prim()
+        if self.e_size >= BORUVKA_MIN_EDGES:
+            return self.boruvka()
+        return self.kruskal()
+
+    def track(self):
+        """
+        Start maintaining the minimum spanning forest along with the degree
+        of its vertexes, so that `add_edge`, `remove_edge` and `set_cost`
+        update them in place and `mst_triple_degree` answers without
+        recomputing the tree.
+        """
+        self.edges = set(self.edges)
+        self.forest = set()
+        self.tree = defaultdict(dict)
+        self.incident = defaultdict(set)
+        self.degree = defaultdict(int)
+        self.triple = set()
+
+        for edge in self.edges:
+            self.incident[edge[0]].add(edge)
+            self.incident[edge[1]].add(edge)
+        if self.v_size and self.e_size:
+            for edge in self.spanning_tree():
+                self._link(edge)
+
+    def _link(self, edge: Tuple[int, int, float]):
+        """
+        Put an edge in the tracked forest.
+        """
+        self.forest.add(edge)
+        for this, other in ((edge[0], edge[1]), (edge[1], edge[0])):
+            self.tree[this][other] = edge
+            self.degree[this] += 1
+            if self.degree[this] == 3:
+                self.triple.add(this)
+
+    def _cut(self, edge: Tuple[int, int, float]):
+        """
+        Take an edge out of the tracked forest.
+        """
+        self.forest.discard(edge)
+        for this, other in ((edge[0], edge[1]), (edge[1], edge[0])):
+            del self.tree[this][other]
+            self.degree[this] -= 1
+            if self.degree[this] == 2:
+                self.triple.discard(this)
+
+    def _heaviest(self, source: int, dest: int):
+        """
+        Costliest edge on the path between two vertexes of the tracked forest,
+        found by a breadth-first search from `source`.
+
+        :return:    The edge, or None if the vertexes are not connected.
+        """
+        through = {source: None}
+        queue = [source]
+        for vertex in queue:
+            if vertex == dest:
+                break
+            for neighbor, edge in self.tree[vertex].items():
+                if neighbor not in through:
+                    through[neighbor] = edge
+                    queue.append(neighbor)
+
+        if dest not in through:
+            return None
+
+        heaviest, vertex = None, dest
+        while vertex != source:
+            edge = through[vertex]
+            if heaviest is None or edge_key(edge) > edge_key(heaviest):
+                heaviest = edge
+            vertex = edge[0] if edge[1] == vertex else edge[1]
+        return heaviest
+
+    def _smaller_side(self, first: int, second: int) -> Set[int]:
+        """
+        Vertexes of the smaller of the two trees holding `first` and `second`
+        after a cut, found by searching both at the same pace and stopping
+        when either runs out.
+        """
+        sides = ({first}, {second})
+        queues = ([first], [second])
+        while True:
+            for side, queue in zip(sides, queues):
+                if not queue:
+                    return side
+                vertex = queue.pop()
+                for neighbor in self.tree[vertex]:
+                    if neighbor not in side:
+                        side.add(neighbor)
+                        queue.append(neighbor)
+
+    def add_edge(self, edge: Tuple[int, int, float]):
+        """
+        Add an edge to the graph. If the forest is tracked, the new edge
+        replaces the costliest one on the cycle it closes, if cheaper.
+
+        :param edge:    Tuple with both ends and the cost of the edge.
+        """
+        if edge[0] not in self.vertex or edge[1] not in self.vertex:
+            raise ValueError("edge {} has unknown ends".format(edge))
+        if edge in self.edges:
+            return
+
+        if not isinstance(self.edges, set):
+            self.edges = set(self.edges)
+        self.edges.add(edge)
+        self.e_size += 1
+        if self.forest is None:
+            return
+
+        self.incident[edge[0]].add(edge)
+        self.incident[edge[1]].add(edge)
+        if edge[0] == edge[1]:
+            return
+
+        heaviest = self._heaviest(edge[0], edge[1])
+        if heaviest is None:
+            self._link(edge)
+        elif edge_key(edge) < edge_key(heaviest):
+            self._cut(heaviest)
+            self._link(edge)
+
+    def remove_edge(self, edge: Tuple[int, int, float]):
+        """
+        Remove an edge from the graph. If it was in the tracked forest, the
+        cheapest edge across the cut, if any, takes its place; it is searched
+        among the edges of the smaller side only.
+
+        :param edge:    Tuple with both ends and the cost of the edge.
+        """
+        if edge not in self.edges:
+            raise ValueError("edge {} is not in the graph".format(edge))
+
+        if not isinstance(self.edges, set):
+            self.edges = set(self.edges)
+        self.edges.remove(edge)
+        self.e_size -= 1
+        if self.forest is None:
+            return
+
+        self.incident[edge[0]].discard(edge)
+        self.incident[edge[1]].discard(edge)
+        if edge not in self.forest:
+            return
+
+        self._cut(edge)
+        side = self._smaller_side(edge[0], edge[1])
+        crossing = [
+            other
+            for vertex in side
+            for other in self.incident[vertex]
+            if (other[0] in side) != (other[1] in side)
+        ]
+        if crossing:
+            self._link(min(crossing, key=edge_key))
+
+    def set_cost(
+        self, edge: Tuple[int, int, float], cost: float
+    ) -> Tuple[int, int, float]:
+        """
+        Change the cost of an edge of the graph.
+
+        :param edge:    Tuple with both ends and the current cost of the edge.
+        :param cost:    New cost of the edge.
+        :return:        The edge with its new cost.
+        """
+        self.remove_edge(edge)
+        updated = (edge[0], edge[1], cost)
+        self.add_edge(updated)
+        return updated
+
     def mst_triple_degree(self) -> Set[Tuple[int, int, float]]:
         """
         Wrapper function that applies the minimal spanning tree algorithm on a
@@ -75,7 +553,10 @@ class Graph:
         :param graph:   Graph structure used to find de minimal spanning tree.
         :return:        The vertexes with 3 or more edges.
         """
-        k_edges = self.kruskal()
+        if self.forest is not None and self.v_size and self.e_size:
+            return set(self.triple)
+
+        k_edges = self.spanning_tree()
 
         if not k_edges:
             return set()
@@ -83,13 +564,153 @@ class Graph:
         if k_edges == self.vertex:
             return self.vertex
 
-        count_list = defaultdict(int)
+        return triple_degree(k_edges)
+
 
-        for edge in k_edges:
-            count_list[edge[0]] += 1
-            count_list[edge[1]] += 1
+def _count_unions(stats: Stats, tried: int, merged: int):
+    """
+    Add the work of the disjoint-set forest in a run of Kruskal's algorithm.
+    """
+    stats.count("unions", tried)
+    stats.count("finds", 2 * tried)
+    stats.count("merges", merged)
 
-        return {edge for edge, count in count_list.items() if count >= 3}
+
+def triple_degree(edges: Iterable[Tuple[int, int, float]]) -> Set[int]:
+    """
+    Sweeps an edge list to locate the vertexes with degree 3 or more, taking
+    each end of the edges (undirected graph).
+
+    :param edges:   Edges of a graph, usually its minimum spanning tree.
+    :return:        The vertexes with 3 or more edges.
+    """
+    count_list = defaultdict(int)
+
+    for edge in edges:
+        count_list[edge[0]] += 1
+        count_list[edge[1]] += 1
+
+    return {edge for edge, count in count_list.items() if count >= 3}
+
+
+def read_edges(path: str, chunk: int = EDGE_CHUNK) -> Iterator[np.ndarray]:
+    """
+    Reads an edge list in chunks of `EDGE_DTYPE` records, either from a CSV
+    file with one `tail,head,cost` line per edge or, for any other extension,
+    from the raw records as written by `ndarray.tofile`.
+
+    :param path:    Path of the edge list.
+    :param chunk:   Maximum number of edges in each chunk.
+    :return:        Generator of arrays of edges.
+    """
+    if path.endswith(".csv"):
+        with open(path) as lines:
+            while True:
+                block = list(islice(lines, chunk))
+                if not block:
+                    return
+                yield np.loadtxt(
+                    block, dtype=EDGE_DTYPE, delimiter=",", ndmin=1
+                )
+
+    with open(path, "rb") as records:
+        while True:
+            block = np.fromfile(records, dtype=EDGE_DTYPE, count=chunk)
+            if not block.size:
+                return
+            yield block
+
+
+def _read_run(path: str, chunk: int) -> Iterator[Tuple[float, int, int]]:
+    """
+    Streams a sorted run back as `(cost, tail, head)` tuples, which compare
+    in the same order as `edge_key`.
+    """
+    for block in read_edges(path, chunk):
+        yield from zip(
+            block["cost"].tolist(),
+            block["tail"].tolist(),
+            block["head"].tolist(),
+        )
+
+
+def _merge_runs(paths: List[str], target: str, chunk: int):
+    """
+    Merges sorted runs into a single longer one at `target`, writing it in
+    blocks of at most `chunk` edges and deleting the merged runs.
+    """
+    share = max(1, chunk // len(paths))
+    buffer = []
+    with open(target, "wb") as output:
+        for edge in merge(*(_read_run(path, share) for path in paths)):
+            buffer.append(edge)
+            if len(buffer) == chunk:
+                _write_run(buffer, output)
+                buffer = []
+        _write_run(buffer, output)
+    for path in paths:
+        os.remove(path)
+
+
+def _write_run(edges: List[Tuple[float, int, int]], output):
+    """
+    Appends `(cost, tail, head)` tuples to an open run as `EDGE_DTYPE`
+    records.
+    """
+    if not edges:
+        return
+    block = np.empty(len(edges), dtype=EDGE_DTYPE)
+    block["cost"], block["tail"], block["head"] = zip(*edges)
+    block.tofile(output)
+
+
+def external_kruskal(
+    path: str, order: int, chunk: int = EDGE_CHUNK, workdir: str = None
+) -> Set[Tuple[int, int, float]]:
+    """
+    Kruskal's algorithm over an edge list too large for memory. Each chunk
+    read by `read_edges` is sorted and written to a temporary run. While
+    there are more than `MERGE_FANIN` runs, groups of that many are merged
+    into longer ones, and the last group is merged back in order to feed the
+    disjoint-set forest. Only one chunk and a block of each run in the group
+    are kept in memory at a time.
+
+    :param path:    Path of the edge list, as read by `read_edges`.
+    :param order:   Number of vertexes, numbered from zero.
+    :param chunk:   Maximum number of edges sorted in memory at once.
+    :param workdir: Directory of the temporary runs, by default the system's.
+    :return:        List of edges that form the minimum spanning tree.
+    """
+    minimal_edges_set = set()
+    components = DisjointSet(order)
+
+    with TemporaryDirectory(dir=workdir) as runs:
+        paths = []
+        for block in read_edges(path, chunk):
+            block.sort(order=["cost", "tail", "head"])
+            paths.append(os.path.join(runs, "{}.run".format(len(paths))))
+            block.tofile(paths[-1])
+
+        while len(paths) > MERGE_FANIN:
+            merged = []
+            for start in range(0, len(paths), MERGE_FANIN):
+                merged.append(
+                    os.path.join(runs, "{}.run".format(len(paths) + start))
+                )
+                _merge_runs(
+                    paths[start : start + MERGE_FANIN], merged[-1], chunk
+                )
+            paths = merged
+
+        # every run gets its share of `chunk` edges as its read buffer
+        share = max(1, chunk // max(1, len(paths)))
+        for cost, tail, head in merge(*(_read_run(p, share) for p in paths)):
+            if components.union(tail, head):
+                minimal_edges_set.add((tail, head, cost))
+                if len(minimal_edges_set) == order - 1:
+                    break
+
+    return minimal_edges_set
 
 
 def random_tests(
@@ -111,7 +732,18 @@ def random_tests(
             for _ in range(connections)
         }
 
-        Graph(vertexes, edges).mst_triple_degree()
+        graph = Graph(vertexes, edges)
+        triple = graph.mst_triple_degree()
+        assert graph.kruskal() == graph.prim() == graph.boruvka()
+        assert triple == graph.mst_triple_degree()
+
+        graph.track()
+        for edge in list(edges)[: connections // 4]:
+            graph.set_cost(edge, randint(0, limit))
+        assert (
+            graph.mst_triple_degree()
+            == Graph(vertexes, graph.edges).mst_triple_degree()
+        )
 
 
 def known_tests():
@@ -133,6 +765,58 @@ def known_tests():
     )
     assert graph.mst_triple_degree() == {1, 4}
 
+    # same graph, counting the work of the disjoint-set forest
+    stats = Stats()
+    graph.kruskal(stats)
+    assert stats["merges"] == 6 and stats["finds"] == 2 * stats["unions"]
+
+    # same graph, with its edges packed in arrays
+    packed = Graph(graph.vertex, EdgeArray.from_edges(graph.edges))
+    indices = packed.kruskal_indices()
+    assert packed.edges.costs[indices].tolist() == [1, 5, 7, 10, 10, 20]
+    assert packed.edges.to_set(indices) == graph.kruskal()
+    assert packed.mst_triple_degree() == {1, 4}
+    edges = list(graph.edges)
+    indices = graph.kruskal_indices()
+    assert isinstance(graph.edges, set)
+    assert {edges[index] for index in indices} == graph.kruskal()
+
+    # same graph, streamed from disk in chunks of two edges
+    with TemporaryDirectory() as folder:
+        path = os.path.join(folder, "edges.csv")
+        with open(path, "w") as dump:
+            dump.writelines("{},{},{}\n".format(*edge) for edge in graph.edges)
+        tree = external_kruskal(path, graph.v_size, chunk=2)
+        assert tree == graph.kruskal()
+        assert triple_degree(tree) == {1, 4}
+
+    # complete graph sorted one edge per run, more than `MERGE_FANIN` of them
+    complete = Graph(
+        set(range(20)),
+        {(i, j, i * j % 13) for i in range(20) for j in range(i + 1, 20)},
+    )
+    with TemporaryDirectory() as folder:
+        path = os.path.join(folder, "edges.csv")
+        with open(path, "w") as dump:
+            dump.writelines(
+                "{},{},{}\n".format(*edge) for edge in complete.edges
+            )
+        assert len(complete.edges) > MERGE_FANIN
+        tree = external_kruskal(path, complete.v_size, chunk=1)
+        assert tree == complete.kruskal()
+
+    # same graph, edited while its spanning tree is tracked
+    graph.track()
+    graph.set_cost((1, 3, 5), 30)
+    assert (3, 5, 11) in graph.forest and (1, 3, 30) not in graph.forest
+    assert graph.mst_triple_degree() == {1, 4}
+    graph.remove_edge((4, 6, 7))
+    assert graph.mst_triple_degree() == {1}
+    graph.add_edge((2, 6, 3))
+    graph.add_edge((2, 5, 0))
+    assert graph.mst_triple_degree() == {2, 5}
+    assert graph.forest == graph.kruskal()
+
     # graph with two components
     graph = Graph(
         {0, 1, 2, 3, 4, 5, 6},
@@ -166,6 +850,14 @@ def known_tests():
     graph = Graph({1, 2, 3, 4, 5, 6}, {})
     assert graph.mst_triple_degree() == {1, 2, 3, 4, 5, 6}
 
+    # graph with ties, where every engine must pick the same edges
+    graph = Graph(
+        {0, 1, 2, 3, 4},
+        {(0, 1, 1), (0, 2, 1), (1, 2, 1), (2, 3, 1), (1, 3, 1), (3, 4, 2)},
+    )
+    tree = {(0, 1, 1), (0, 2, 1), (1, 3, 1), (3, 4, 2)}
+    assert graph.kruskal() == graph.prim() == graph.boruvka() == tree
+
 
 if __name__ == "__main__":
     known_tests()